@@ -1,15 +1,25 @@
 # app.py - COMPLETE VERSION WITH KHALTI PAYMENT INTEGRATION
 import os
+import hmac
+import json
+import bisect
+import hashlib
 import sqlite3
-import pickle
+import threading
+import time
 import requests
 from datetime import datetime, timedelta
 from functools import wraps
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from flask import Flask, request, render_template, redirect, url_for, flash, session, jsonify
+from flask import Flask, Response, request, render_template, redirect, url_for, flash, session, jsonify, stream_with_context
 
-import pandas as pd
+import numpy as np
+
+import model_registry
+from model_bundle import MODEL_FILENAME, load_model_bundle
+from micro_batcher import MicroBatcher
+from scoring_worker import BackgroundScorer
 
 # -----------------------
 # CONFIG
@@ -23,16 +33,12 @@ DB_PATH = os.path.join(BASE_DIR, "hotel_booking.db")
 
 # Model files
 MODEL_DIR = os.path.join(BASE_DIR, "model_files")
-RF_MODEL_PATH = os.path.join(MODEL_DIR, "random_forest_model.pkl")
-ENCODERS_PATH = os.path.join(MODEL_DIR, "encoders.pkl")
-FEATURE_COLS_PATH = os.path.join(MODEL_DIR, "feature_cols.pkl")
+RF_MODEL_PATH = os.path.join(MODEL_DIR, MODEL_FILENAME)
 
 # File upload config
 UPLOAD_FOLDER = os.path.join("static", "uploads", "rooms")
 MENU_PLAN_UPLOAD_FOLDER = os.path.join("static", "uploads", "menu_plans")
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(MENU_PLAN_UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["MENU_PLAN_UPLOAD_FOLDER"] = MENU_PLAN_UPLOAD_FOLDER
 
@@ -47,11 +53,58 @@ KHALTI_GATEWAY_URL = "https://dev.khalti.com/api/v2"
 app.config['KHALTI_SECRET_KEY'] = KHALTI_SECRET_KEY
 app.config['KHALTI_PUBLIC_KEY'] = KHALTI_PUBLIC_KEY
 
+# ========================================
+# PREDICTION API CONFIGURATION
+# ========================================
+# Bearer token for machine clients (e.g. the channel manager); empty = admin session only
+app.config["PREDICT_API_TOKEN"] = os.getenv("PREDICT_API_TOKEN", "")
+# Records scored per predict_proba call / per streamed response chunk
+app.config["PREDICT_STREAM_CHUNK"] = 1000
+# Background scoring of new/modified bookings (threads, ids per model call)
+app.config["SCORING_WORKERS"] = 2
+app.config["SCORING_BATCH_SIZE"] = 256
+# Micro-batching of concurrent small scoring calls (see micro_batcher.py): calls of at most
+# MICROBATCH_ROW_LIMIT rows wait up to MICROBATCH_MAX_WAIT_MS to share one model call
+app.config["MICROBATCH_ENABLED"] = os.getenv("MICROBATCH", "1").lower() in ("1", "true", "yes")
+app.config["MICROBATCH_ROW_LIMIT"] = 16
+app.config["MICROBATCH_MAX_BATCH"] = int(os.getenv("MICROBATCH_MAX_BATCH", "256"))
+app.config["MICROBATCH_MAX_WAIT_MS"] = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2"))
+app.config["MICROBATCH_MAX_QUEUE"] = int(os.getenv("MICROBATCH_MAX_QUEUE", "1024"))
+# Batches larger than this are scored by the sklearn model rather than the flattened forest:
+# on hotel.csv rows they break even around 512-1024 rows and sklearn is 2x faster at 36k
+app.config["SKLEARN_BATCH_ROWS"] = int(os.getenv("SKLEARN_BATCH_ROWS", "512"))
+
+# ========================================
+# STARTUP / MODEL LOADING
+# ========================================
+# Memory-map the flattened forest from a cache in model_files/ (pages shared by all workers)
+app.config["MODEL_MMAP"] = os.getenv("MODEL_MMAP", "").lower() in ("1", "true", "yes")
+# Load the model in create_app() rather than on first use, e.g. before gunicorn --preload forks
+app.config["PRELOAD_MODEL"] = os.getenv("PRELOAD_MODEL", "").lower() in ("1", "true", "yes")
+# create_app() warns when initialisation takes longer than this
+app.config["STARTUP_BUDGET_MS"] = 500
+# How often each process checks model_files/ACTIVE for a newly activated version
+app.config["MODEL_POINTER_CHECK_SECONDS"] = 5
+
+# ========================================
+# AVAILABILITY SEARCH
+# ========================================
+# Rooms per /api/availability page (default, and the most a client may ask for)
+app.config["AVAILABILITY_PAGE_SIZE"] = 20
+app.config["AVAILABILITY_MAX_PAGE_SIZE"] = 100
+# Longest from/to window /api/rooms/<id>/unavailable?format=bits will encode
+app.config["AVAILABILITY_MAX_BITS_DAYS"] = 1096
+
 # -----------------------
 # DATABASE INITIALIZATION
 # -----------------------
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
+# SQL twins of booking_window_from_row, for backfilling bookings.checkin_date/checkout_date
+ARRIVAL_DATE_SQL = "date(printf('%04d-%02d-%02d', arrival_year, arrival_month, arrival_date))"
+STAY_NIGHTS_SQL = """CASE WHEN total_nights > 0 THEN total_nights
+                          ELSE COALESCE(no_of_weekend_nights, 0) + COALESCE(no_of_week_nights, 0) END"""
+
+def init_db(db_path=None):
+    conn = sqlite3.connect(db_path or DB_PATH)
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -72,9 +125,12 @@ def init_db():
             room_type_name TEXT UNIQUE NOT NULL,
             description TEXT,
             price_per_night INTEGER,
-            image_path TEXT
+            image_path TEXT,
+            max_guests INTEGER
         )
     """)
+    # max_guests: NULL = no limit for the availability search
+    add_missing_columns(cursor, "room_types", {"max_guests": "INTEGER"})
 
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS rooms (
@@ -82,9 +138,12 @@ def init_db():
             room_number TEXT UNIQUE NOT NULL,
             room_type_id INTEGER NOT NULL,
             price_per_night INTEGER,
+            availability_stamp INTEGER NOT NULL DEFAULT 0,
             FOREIGN KEY(room_type_id) REFERENCES room_types(room_type_id) ON DELETE CASCADE
         )
     """)
+    # availability_stamp: bumped with every booking insert/cancel for the room, see room_availability()
+    add_missing_columns(cursor, "rooms", {"availability_stamp": "INTEGER NOT NULL DEFAULT 0"})
 
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS meal_plans (
@@ -125,6 +184,8 @@ def init_db():
             no_of_special_requests INTEGER DEFAULT 0,
             total_nights INTEGER,
             total_guests INTEGER,
+            checkin_date TEXT,
+            checkout_date TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY(customer_id) REFERENCES customers(customer_id),
@@ -133,10 +194,138 @@ def init_db():
             FOREIGN KEY(market_segment_id) REFERENCES market_segments(market_segment_id)
         )
     """)
+
+    # Stay as ISO dates (checkout exclusive), so overlap checks are one indexed range query
+    add_missing_columns(cursor, "bookings", {"checkin_date": "TEXT", "checkout_date": "TEXT"})
+    cursor.execute(f"""
+        UPDATE bookings
+        SET checkin_date = {ARRIVAL_DATE_SQL},
+            checkout_date = date({ARRIVAL_DATE_SQL}, '+' || {STAY_NIGHTS_SQL} || ' days')
+        WHERE checkin_date IS NULL OR checkout_date IS NULL
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_bookings_room_stay
+        ON bookings(room_id, booking_status, checkin_date, checkout_date)
+    """)
+
+    # One row per booked night of every active booking; the primary key makes a double booking
+    # fail at insert time. Filled from bookings when first created, see rebuild_room_nights.py
+    has_room_nights = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'room_nights'"
+    ).fetchone()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS room_nights (
+            room_id INTEGER NOT NULL,
+            night_date TEXT NOT NULL,
+            booking_id INTEGER NOT NULL,
+            PRIMARY KEY (room_id, night_date),
+            FOREIGN KEY(room_id) REFERENCES rooms(room_id) ON DELETE CASCADE,
+            FOREIGN KEY(booking_id) REFERENCES bookings(booking_id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_room_nights_booking ON room_nights(booking_id)")
+    if not has_room_nights:
+        fill_room_nights(cursor)
+
+    # Cached model output per booking; valid while feature_hash and model_version match.
+    # contributions: JSON {"bias": b, "values": [...]} in the model's feature_cols order
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS booking_predictions (
+            booking_id INTEGER PRIMARY KEY,
+            feature_hash TEXT NOT NULL,
+            model_version TEXT NOT NULL,
+            cancellation_probability REAL NOT NULL,
+            contributions TEXT,
+            scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(booking_id) REFERENCES bookings(booking_id) ON DELETE CASCADE
+        )
+    """)
+    add_missing_columns(cursor, "booking_predictions", {"contributions": "TEXT"})
     conn.commit()
     conn.close()
 
-init_db()
+def add_missing_columns(cursor, table, columns):
+    """ALTER TABLE ADD COLUMN for each of `columns` ({name: declaration}) the table lacks."""
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    for name, declaration in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {declaration}")
+
+# (room_id, night_date, booking_id) for every night of the active bookings matching {where_sql}
+ROOM_NIGHTS_SQL = """
+    WITH RECURSIVE nights(room_id, night_date, booking_id, checkout_date) AS (
+        SELECT room_id, checkin_date, booking_id, checkout_date FROM bookings
+        WHERE booking_status = 'Not_Canceled' AND checkout_date > checkin_date AND ({where_sql})
+        UNION ALL
+        SELECT room_id, date(night_date, '+1 day'), booking_id, checkout_date FROM nights
+        WHERE date(night_date, '+1 day') < checkout_date
+    )
+    SELECT room_id, night_date, booking_id FROM nights ORDER BY booking_id
+"""
+
+def fill_room_nights(conn, where_sql="1", params=()):
+    """Add the nights of active bookings matching `where_sql` to room_nights; returns (nights, conflicts).
+
+    Nights already taken are skipped (the lower booking_id wins), so this
+    also fills in nights freed by a cancellation. conflicts counts nights
+    claimed by more than one booking.
+    """
+    nights_sql = ROOM_NIGHTS_SQL.format(where_sql=where_sql)
+    nights = conn.execute(f"SELECT COUNT(*) FROM ({nights_sql})", params).fetchone()[0]
+    added = conn.execute(f"INSERT OR IGNORE INTO room_nights (room_id, night_date, booking_id) {nights_sql}",
+                         params).rowcount
+    return added, nights - added
+
+def rebuild_room_nights(conn):
+    """Regenerate room_nights from bookings on `conn` (caller commits); returns (nights, conflicts)."""
+    conn.execute("DELETE FROM room_nights")
+    nights = fill_room_nights(conn)
+    # Availability calendars are built from room_nights; make every process rebuild them
+    conn.execute("UPDATE rooms SET availability_stamp = availability_stamp + 1")
+    return nights
+
+def claim_room_nights(conn, booking_id, room_id, checkin, checkout):
+    """Record a new booking's nights; raises sqlite3.IntegrityError if any is taken. Same transaction as the insert."""
+    conn.executemany(
+        "INSERT INTO room_nights (room_id, night_date, booking_id) VALUES (?, ?, ?)",
+        [(room_id, (checkin + timedelta(days=i)).isoformat(), booking_id) for i in range((checkout - checkin).days)],
+    )
+
+def release_room_nights(conn, booking):
+    """Free a canceled booking's nights (a bookings row); same transaction as the status update."""
+    conn.execute("DELETE FROM room_nights WHERE booking_id = ?", (booking["booking_id"],))
+    # Legacy overlapping bookings may still cover some of those nights
+    fill_room_nights(conn, "room_id = ? AND checkin_date < ? AND checkout_date > ?",
+                     (booking["room_id"], booking["checkout_date"], booking["checkin_date"]))
+
+_init_lock = threading.Lock()
+
+def create_app():
+    """Application factory: create the DB schema and upload folders, return the app.
+
+    Importing this module has no side effects; run it with
+    `gunicorn "app:create_app()"`. Calling it again is a no-op. The model is
+    loaded on first use unless PRELOAD_MODEL is set.
+    """
+    start = time.perf_counter()
+    with _init_lock:
+        if not app.config.get("INITIALIZED"):
+            os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+            os.makedirs(app.config["MENU_PLAN_UPLOAD_FOLDER"], exist_ok=True)
+            init_db()
+            app.config["INITIALIZED"] = True
+    if app.config["PRELOAD_MODEL"]:
+        get_model_bundle()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if elapsed_ms > app.config["STARTUP_BUDGET_MS"]:
+        print(f"Startup took {elapsed_ms:.0f} ms (budget {app.config['STARTUP_BUDGET_MS']} ms)")
+    return app
+
+@app.before_request
+def ensure_app_initialized():
+    # `flask run` and `gunicorn app:app` pick up the module-level app and skip the factory
+    if not app.config.get("INITIALIZED"):
+        create_app()
 
 # -----------------------
 # HELPERS
@@ -179,45 +368,189 @@ def booking_window_from_row(row):
     return checkin, checkout, total_nights
 
 def is_room_available(room_id, checkin, checkout):
-    """Check for overlapping active bookings for the same room."""
+    """Check for booked nights of the same room within [checkin, checkout)."""
     conn = get_db_connection()
+    overlap = conn.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM room_nights
+            WHERE room_id = ? AND night_date >= ? AND night_date < ?
+        )
+    """, (room_id, checkin.isoformat(), checkout.isoformat())).fetchone()[0]
+    conn.close()
+    return not overlap
+
+
+# room_id -> (availability_stamp, ranges, etag); entries are checked against rooms.availability_stamp
+# on every read, so a booking written by another worker process invalidates them too
+_availability_cache = {}
+_availability_lock = threading.Lock()
+
+def ranges_in_window(ranges, start=None, end=None):
+    """Merged `ranges` overlapping [start, end) (ISO dates, None = open), clipped to the window."""
+    # Merged ranges are disjoint, so their ends are sorted as well as their starts
+    lo = 0 if start is None else bisect.bisect_right(ranges, start, key=lambda r: r["end"])
+    hi = len(ranges) if end is None else bisect.bisect_left(ranges, end, key=lambda r: r["start"])
+    window = ranges[lo:hi]
+    if window and start is not None and window[0]["start"] < start:
+        window[0] = dict(window[0], start=start)
+    if window and end is not None and window[-1]["end"] > end:
+        window[-1] = dict(window[-1], end=end)
+    return window
+
+def occupancy_bits(ranges, start, end):
+    """One character per night in [start, end) (date objects): "1" booked, "0" free."""
+    bits = bytearray(b"0" * (end - start).days)
+    for r in ranges_in_window(ranges, start.isoformat(), end.isoformat()):
+        first = (datetime.strptime(r["start"], "%Y-%m-%d").date() - start).days
+        last = (datetime.strptime(r["end"], "%Y-%m-%d").date() - start).days
+        bits[first:last] = b"1" * (last - first)
+    return bits.decode()
+
+def room_availability(conn, room_id):
+    """(booked date ranges, strong ETag) for a room.
+
+    Ranges are {"start", "end"} ISO dates with exclusive checkout, sorted,
+    built from runs of consecutive room_nights rows, so overlapping and
+    back-to-back bookings come back merged and the calendar agrees with
+    is_room_available.
+    """
+    stamp = conn.execute("SELECT availability_stamp FROM rooms WHERE room_id = ?", (room_id,)).fetchone()
+    stamp = stamp[0] if stamp else None
+    with _availability_lock:
+        cached = _availability_cache.get(room_id)
+    if cached is not None and cached[0] == stamp:
+        return cached[1], cached[2]
+
+    # Consecutive nights share julianday(night) - row number; each such run is one range
     rows = conn.execute("""
-        SELECT room_id, arrival_year, arrival_month, arrival_date,
-               total_nights, no_of_weekend_nights, no_of_week_nights, booking_status
-        FROM bookings
-        WHERE room_id = ? AND booking_status = 'Not_Canceled'
+        SELECT MIN(night_date) AS start, date(MAX(night_date), '+1 day') AS end
+        FROM (
+            SELECT night_date, julianday(night_date) - ROW_NUMBER() OVER (ORDER BY night_date) AS run
+            FROM room_nights WHERE room_id = ?
+        )
+        GROUP BY run
+        ORDER BY start
     """, (room_id,)).fetchall()
-    conn.close()
-
-    for r in rows:
-        existing_checkin, existing_checkout, _ = booking_window_from_row(r)
-        if checkin < existing_checkout and checkout > existing_checkin:
-            return False
-    return True
-
+    ranges = [{"start": r["start"], "end": r["end"]} for r in rows]
+    etag = hashlib.sha256(json.dumps(ranges, separators=(",", ":")).encode()).hexdigest()[:32]
+    with _availability_lock:
+        _availability_cache[room_id] = (stamp, ranges, etag)
+    return ranges, etag
+
+def invalidate_room_availability(conn, room_id):
+    """Mark a room's cached ranges stale; call when inserting or canceling its bookings, in that transaction."""
+    conn.execute("UPDATE rooms SET availability_stamp = availability_stamp + 1 WHERE room_id = ?", (room_id,))
+    with _availability_lock:
+        _availability_cache.pop(room_id, None)
 
 @app.route("/api/rooms/<int:room_id>/unavailable", methods=["GET"])
 def room_unavailable_ranges(room_id):
-    """Return booked date ranges for a room (exclusive checkout) for client-side blocking."""
+    """Return booked date ranges for a room (exclusive checkout) for client-side blocking.
+
+    ?from=YYYY-MM-DD&to=YYYY-MM-DD limits the answer to that window (`to`
+    exclusive; either may be left open) and clips the ranges to it.
+    Overlapping and back-to-back bookings come back as one range.
+    &format=bits (both bounds required) returns the window as a string
+    with one character per night instead, "1" booked and "0" free.
+
+    The response carries a strong ETag; a matching If-None-Match gets 304.
+    """
+    try:
+        start = request.args.get("from")
+        end = request.args.get("to")
+        start = datetime.strptime(start, "%Y-%m-%d").date() if start else None
+        end = datetime.strptime(end, "%Y-%m-%d").date() if end else None
+    except ValueError:
+        return jsonify({"success": False, "error": "from and to must be YYYY-MM-DD dates"}), 400
+    if start and end and end <= start:
+        return jsonify({"success": False, "error": "to must be after from"}), 400
+    bits = request.args.get("format") == "bits"
+    if bits and not (start and end and (end - start).days <= app.config["AVAILABILITY_MAX_BITS_DAYS"]):
+        return jsonify({"success": False, "error": "format=bits needs from and to at most "
+                        f"{app.config['AVAILABILITY_MAX_BITS_DAYS']} days apart"}), 400
+
+    conn = get_db_connection()
+    ranges, etag = room_availability(conn, room_id)
+    conn.close()
+    if start or end or bits:
+        window = f"{etag}:{start}:{end}:{bits}"
+        etag = hashlib.sha256(window.encode()).hexdigest()[:32]
+
+    # Answer revalidations before serializing anything
+    if request.if_none_match.contains_weak(etag):  # If-None-Match uses weak comparison (RFC 9110)
+        response = app.response_class(status=304)
+    elif bits:
+        response = jsonify({"from": start.isoformat(), "to": end.isoformat(),
+                            "bits": occupancy_bits(ranges, start, end)})
+    else:
+        payload = {"ranges": ranges_in_window(ranges, start and start.isoformat(), end and end.isoformat())}
+        if start:
+            payload["from"] = start.isoformat()
+        if end:
+            payload["to"] = end.isoformat()
+        response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"  # revalidate every time; 304s are cheap
+    return response
+
+@app.route("/api/availability", methods=["GET"])
+def api_availability():
+    """Rooms free for a whole stay: ?checkin=YYYY-MM-DD&checkout=YYYY-MM-DD[&guests=N][&room_type=ID][&page=N][&per_page=N].
+
+    One query over rooms and room_nights; the overlap test per room is an
+    EXISTS on the room_nights primary key. Rooms are ordered by room number;
+    has_more tells whether a next page exists.
+    """
+    try:
+        checkin = datetime.strptime(request.args.get("checkin", ""), "%Y-%m-%d").date()
+        checkout = datetime.strptime(request.args.get("checkout", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"success": False, "error": "checkin and checkout must be YYYY-MM-DD dates"}), 400
+    if checkout <= checkin:
+        return jsonify({"success": False, "error": "Stay must be at least 1 night"}), 400
+
+    # type=int would silently fall back to the default on malformed values
+    try:
+        guests = int(request.args.get("guests", 1))
+        room_type = request.args.get("room_type")
+        room_type = int(room_type) if room_type is not None else None
+        page = int(request.args.get("page", 1))
+        per_page = int(request.args.get("per_page", app.config["AVAILABILITY_PAGE_SIZE"]))
+    except ValueError:
+        return jsonify({"success": False, "error": "guests, room_type, page and per_page must be integers"}), 400
+    if guests < 1 or page < 1 or not 1 <= per_page <= app.config["AVAILABILITY_MAX_PAGE_SIZE"]:
+        return jsonify({"success": False, "error": "Invalid guests, page or per_page"}), 400
+
     conn = get_db_connection()
     rows = conn.execute("""
-        SELECT arrival_year, arrival_month, arrival_date,
-               total_nights, no_of_weekend_nights, no_of_week_nights
-        FROM bookings
-        WHERE room_id = ? AND booking_status = 'Not_Canceled'
-    """, (room_id,)).fetchall()
+        SELECT r.room_id, r.room_number, r.price_per_night, t.room_type_id, t.room_type_name,
+               t.max_guests, t.image_path
+        FROM rooms r
+        JOIN room_types t ON r.room_type_id = t.room_type_id
+        WHERE (:room_type IS NULL OR r.room_type_id = :room_type)
+          AND (t.max_guests IS NULL OR t.max_guests >= :guests)
+          AND NOT EXISTS (
+              SELECT 1 FROM room_nights n
+              WHERE n.room_id = r.room_id AND n.night_date >= :checkin AND n.night_date < :checkout
+          )
+        ORDER BY r.room_number
+        LIMIT :limit OFFSET :offset
+    """, {
+        "room_type": room_type, "guests": guests,
+        "checkin": checkin.isoformat(), "checkout": checkout.isoformat(),
+        "limit": per_page + 1, "offset": (page - 1) * per_page,
+    }).fetchall()
     conn.close()
 
-    ranges = []
-    for r in rows:
-        start, end, total_nights = booking_window_from_row(r)
-        if total_nights <= 0:
-            continue
-        ranges.append({
-            "start": start.isoformat(),
-            "end": end.isoformat()  # checkout (exclusive)
-        })
-    return jsonify({"ranges": ranges})
+    return jsonify({
+        "checkin": checkin.isoformat(),
+        "checkout": checkout.isoformat(),
+        "nights": (checkout - checkin).days,
+        "page": page,
+        "per_page": per_page,
+        "has_more": len(rows) > per_page,
+        "rooms": [dict(r) for r in rows[:per_page]],
+    })
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -242,20 +575,34 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated
 
+def api_admin_required(f):
+    """Admin session or `Authorization: Bearer <PREDICT_API_TOKEN>`; JSON 401 otherwise."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if session.get("is_admin"):
+            return f(*args, **kwargs)
+        token = app.config.get("PREDICT_API_TOKEN")
+        auth = request.headers.get("Authorization", "")
+        if token and auth.startswith("Bearer ") and hmac.compare_digest(auth[len("Bearer "):], token):
+            return f(*args, **kwargs)
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    return decorated
+
 def create_booking_from_session(booking_data):
     """Create booking using data stored in session after payment"""
     conn = get_db_connection()
     try:
         customer_id = session["user_id"]
-        conn.execute("""
+        checkin, checkout, _ = booking_window_from_payload(booking_data)
+        cur = conn.execute("""
             INSERT INTO bookings (
                 customer_id, room_id, meal_plan_id, market_segment_id, booking_status,
                 no_of_adults, no_of_children, no_of_weekend_nights, no_of_week_nights,
                 lead_time, arrival_year, arrival_month, arrival_date,
                 avg_price_per_room, no_of_special_requests, required_car_parking_space,
                 repeated_guest, no_of_previous_cancellations, no_of_previous_bookings_not_canceled,
-                total_nights, total_guests
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                total_nights, total_guests, checkin_date, checkout_date
+            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
         """, (
             customer_id, booking_data['room_id'], booking_data['meal_plan_id'], 
             booking_data['market_segment_id'], "Not_Canceled",
@@ -267,9 +614,13 @@ def create_booking_from_session(booking_data):
             booking_data.get('required_car_parking_space', 0),
             booking_data.get('repeated_guest', 0), booking_data.get('no_of_previous_cancellations', 0),
             booking_data.get('no_of_previous_bookings_not_canceled', 0),
-            booking_data['total_nights'], booking_data['total_guests']
+            booking_data['total_nights'], booking_data['total_guests'],
+            checkin.isoformat(), checkout.isoformat()
         ))
+        claim_room_nights(conn, cur.lastrowid, booking_data['room_id'], checkin, checkout)
+        invalidate_room_availability(conn, booking_data['room_id'])
         conn.commit()
+        enqueue_booking_scoring(cur.lastrowid)
         return True
     except Exception as e:
         conn.rollback()
@@ -281,36 +632,89 @@ def create_booking_from_session(booking_data):
 # -----------------------
 # LOAD MODEL & ENCODERS
 # -----------------------
-rf_model = None
-encoders = {}
-feature_cols = [
-    'no_of_adults', 'no_of_children', 'no_of_weekend_nights', 'no_of_week_nights',
-    'required_car_parking_space', 'lead_time', 'arrival_year', 'arrival_month', 'arrival_date',
-    'repeated_guest', 'no_of_previous_cancellations', 'no_of_previous_bookings_not_canceled',
-    'avg_price_per_room', 'no_of_special_requests', 'type_of_meal_plan_encoded',
-    'room_type_reserved_encoded', 'market_segment_type_encoded', 'total_nights', 'total_guests'
-]
-
-if os.path.exists(RF_MODEL_PATH):
+_model_bundle = None
+_model_lock = threading.Lock()
+# Registry version the loaded bundle came from (None = unversioned model_files/ layout)
+_loaded_pointer = None
+_reload_lock = threading.Lock()
+model_reload_status = {"loading": None, "last_error": None, "failed_version": None, "last_checked": 0.0}
+
+def load_active_bundle(version):
+    if version is None:
+        return load_model_bundle(MODEL_DIR, mmap=app.config["MODEL_MMAP"])
+    return model_registry.load_version(MODEL_DIR, version, mmap=app.config["MODEL_MMAP"])
+
+def get_model_bundle():
+    """The loaded ModelBundle. The first caller loads it; concurrent callers wait for that load.
+
+    Callers should fetch the bundle once and use it for the whole request or
+    batch: reload_model() may swap in a new one at any time.
+    """
+    global _model_bundle, _loaded_pointer
+    bundle = _model_bundle
+    if bundle is None:
+        with _model_lock:
+            if _model_bundle is None:
+                pointer = model_registry.active_version(MODEL_DIR)
+                try:
+                    bundle = load_active_bundle(pointer)
+                except model_registry.RegistryError as e:
+                    print("Could not load active model version, using model_files/:", e)
+                    model_reload_status["last_error"] = str(e)
+                    bundle = load_active_bundle(None)
+                build_encoding_tables(bundle)
+                _model_bundle = bundle
+                _loaded_pointer = pointer
+            bundle = _model_bundle
+    return bundle
+
+def reload_model(version):
+    """Load registry `version` and swap it in; in-flight requests finish on the old bundle.
+
+    Returns False if another reload is already running.
+    """
+    global _model_bundle, _loaded_pointer
+    if not _reload_lock.acquire(blocking=False):
+        return False
     try:
-        with open(RF_MODEL_PATH, "rb") as f:
-            rf_model = pickle.load(f)
+        model_reload_status["loading"] = version
+        generation = _encoding_generation
+        bundle = load_active_bundle(version)
+        build_encoding_tables(bundle)
+        with _model_lock:
+            if generation != _encoding_generation:
+                # An admin changed categories while we were loading
+                build_encoding_tables(bundle)
+            _model_bundle = bundle
+            _loaded_pointer = version
+        model_reload_status["last_error"] = model_reload_status["failed_version"] = None
+        print(f"Model version {bundle.version} is now active")
     except Exception as e:
-        print("Could not load RF model:", e)
+        model_reload_status["last_error"] = str(e)
+        model_reload_status["failed_version"] = version
+        print(f"Model reload to {version} failed:", e)
+        return True
+    finally:
+        model_reload_status["loading"] = None
+        _reload_lock.release()
+    # Stored predictions are keyed by model version; rescore them for the new one
+    start_scoring_drain()
+    return True
 
-if os.path.exists(ENCODERS_PATH):
-    try:
-        with open(ENCODERS_PATH, "rb") as f:
-            encoders = pickle.load(f)
-    except Exception as e:
-        print("Could not load encoders:", e)
-
-if os.path.exists(FEATURE_COLS_PATH):
-    try:
-        with open(FEATURE_COLS_PATH, "rb") as f:
-            feature_cols = pickle.load(f)
-    except Exception as e:
-        print("Could not load feature columns:", e)
+def start_model_reload(version):
+    threading.Thread(target=reload_model, args=(version,), name="model-reload", daemon=True).start()
+
+@app.before_request
+def check_active_model_version():
+    """Pick up a version activated by another process (CLI or another worker), at most every few seconds."""
+    now = time.monotonic()
+    if _model_bundle is None or now - model_reload_status["last_checked"] < app.config["MODEL_POINTER_CHECK_SECONDS"]:
+        return
+    model_reload_status["last_checked"] = now
+    pointer = model_registry.active_version(MODEL_DIR)
+    if pointer not in (None, _loaded_pointer, model_reload_status["failed_version"]) \
+            and model_reload_status["loading"] is None:
+        start_model_reload(pointer)
 
 # -----------------------
 # DB->MODEL MAPPINGS
@@ -338,18 +742,21 @@ SEGMENT_MAP = {
     "Complementary": "Complementary",
 }
 
-def map_and_encode(db_value, mapping_dict, encoder, default_model_cat=None):
-    if db_value is None:
-        return -1
+def lookup_model_category(db_value, mapping_dict, default_model_cat=None):
+    """hotel.csv category for a DB category name (exact, then case-insensitive match)."""
     model_cat = mapping_dict.get(db_value)
-    if model_cat is None:
+    if model_cat is None and db_value is not None:
         db_lower = str(db_value).strip().lower()
         for k, v in mapping_dict.items():
             if isinstance(k, str) and k.strip().lower() == db_lower:
                 model_cat = v
                 break
-    if model_cat is None:
-        model_cat = default_model_cat
+    return default_model_cat if model_cat is None else model_cat
+
+def map_and_encode(db_value, mapping_dict, encoder, default_model_cat=None):
+    if db_value is None:
+        return -1
+    model_cat = lookup_model_category(db_value, mapping_dict, default_model_cat)
     try:
         if model_cat is not None and encoder is not None and hasattr(encoder, "classes_"):
             if model_cat in encoder.classes_:
@@ -362,6 +769,404 @@ def map_and_encode(db_value, mapping_dict, encoder, default_model_cat=None):
         pass
     return -1
 
+# Encoded feature -> (encoder key, DB->model mapping, default model category, DB names query)
+CATEGORY_FEATURES = {
+    "type_of_meal_plan_encoded": ("type_of_meal_plan", MEAL_MAP, "Not Selected", "SELECT meal_plan_name FROM meal_plans"),
+    "room_type_reserved_encoded": ("room_type_reserved", ROOM_MAP, "Room_Type 1", "SELECT room_type_name FROM room_types"),
+    "market_segment_type_encoded": ("market_segment_type", SEGMENT_MAP, "Offline", "SELECT segment_name FROM market_segments"),
+}
+
+def category_encoder(bundle, feature):
+    encoder_key = CATEGORY_FEATURES[feature][0]
+    return bundle.encoders.get(encoder_key) or bundle.encoders.get(feature)
+
+def build_encoding_tables(bundle):
+    """Resolve every known DB category name to its model code in one pass.
+
+    Runs at model load and whenever admins add or remove meal plans, room
+    types or market segments, so request-time encoding is a dict lookup.
+    """
+    conn = get_db_connection()
+    try:
+        tables = {}
+        model_tables = {}
+        for feature, (_, mapping_dict, default_model_cat, names_query) in CATEGORY_FEATURES.items():
+            encoder = category_encoder(bundle, feature)
+            db_names = {row[0] for row in conn.execute(names_query).fetchall()}
+            tables[feature] = {
+                name: map_and_encode(name, mapping_dict, encoder, default_model_cat)
+                for name in db_names | set(mapping_dict)
+            }
+            # LabelEncoder codes are positions in the sorted classes_
+            classes = getattr(encoder, "classes_", [])
+            model_tables[feature] = {str(c): i for i, c in enumerate(classes)}
+    finally:
+        conn.close()
+    bundle.encoding_tables = tables
+    bundle.model_code_tables = model_tables
+
+_encoding_generation = 0
+
+def refresh_encoding_tables():
+    """Rebuild the tables after a category change; a not-yet-loaded model builds them on load.
+
+    Holds _model_lock, like the bundle swap in reload_model(), so the
+    generation bump and the rebuild cannot interleave with a swap or
+    another refresh.
+    """
+    global _encoding_generation
+    with _model_lock:
+        _encoding_generation += 1
+        bundle = _model_bundle
+        if bundle is not None:
+            build_encoding_tables(bundle)
+
+def encode_category(bundle, feature, db_value):
+    """O(1) DB name -> model code; unseen names are resolved once and memoized."""
+    if db_value is None:
+        return -1
+    table = bundle.encoding_tables.setdefault(feature, {})
+    code = table.get(db_value)
+    if code is None:
+        _, mapping_dict, default_model_cat, _ = CATEGORY_FEATURES[feature]
+        code = map_and_encode(db_value, mapping_dict, category_encoder(bundle, feature), default_model_cat)
+        table[db_value] = code
+    return code
+
+def encode_model_category(bundle, feature, model_cat):
+    """hotel.csv category -> code; unknown categories become -1 as in train.ipynb."""
+    return bundle.model_code_tables.get(feature, {}).get(str(model_cat), -1)
+
+def booking_model_features(b, meal_enc, room_enc, seg_enc):
+    """Model feature dict for one joined booking row, given its encoded categories."""
+    return {
+        "no_of_adults": b["no_of_adults"],
+        "no_of_children": b["no_of_children"],
+        "no_of_weekend_nights": b["no_of_weekend_nights"],
+        "no_of_week_nights": b["no_of_week_nights"],
+        "required_car_parking_space": b["required_car_parking_space"],
+        "lead_time": b["lead_time"],
+        "arrival_year": b["arrival_year"],
+        "arrival_month": b["arrival_month"],
+        "arrival_date": b["arrival_date"],
+        "repeated_guest": b["repeated_guest"],
+        "no_of_previous_cancellations": b["no_of_previous_cancellations"],
+        "no_of_previous_bookings_not_canceled": b["no_of_previous_bookings_not_canceled"],
+        "avg_price_per_room": b["avg_price_per_room"],
+        "no_of_special_requests": b["no_of_special_requests"],
+        "type_of_meal_plan_encoded": meal_enc,
+        "room_type_reserved_encoded": room_enc,
+        "market_segment_type_encoded": seg_enc,
+        "total_nights": b["total_nights"] if b["total_nights"] is not None else (b["no_of_weekend_nights"] + b["no_of_week_nights"]),
+        "total_guests": b["total_guests"] if b["total_guests"] is not None else (b["no_of_adults"] + b["no_of_children"])
+    }
+
+# Booking rows with the category names the encoders need, for scoring outside the admin views
+SCORING_ROWS_SQL = """
+    SELECT b.*,
+           COALESCE(t.room_type_name, 'Unknown Room Type') AS room_type_name,
+           m.meal_plan_name,
+           s.segment_name
+    FROM bookings b
+    LEFT JOIN rooms r ON b.room_id = r.room_id
+    LEFT JOIN room_types t ON r.room_type_id = t.room_type_id
+    LEFT JOIN meal_plans m ON b.meal_plan_id = m.meal_plan_id
+    LEFT JOIN market_segments s ON b.market_segment_id = s.market_segment_id
+"""
+
+# Checkout date of a SCORING_ROWS_SQL row; rows init_db has not backfilled yet fall back to
+# the same expression the backfill uses
+FINAL_CHECKOUT_SQL = f"COALESCE(b.checkout_date, date({ARRIVAL_DATE_SQL}, '+' || {STAY_NIGHTS_SQL} || ' days'))"
+
+# Bookings whose outcome is final: cancelled, or the stay has ended
+FINAL_OUTCOME_SQL = SCORING_ROWS_SQL + f"""
+    WHERE (b.booking_status = 'Canceled' OR {FINAL_CHECKOUT_SQL} <= date('now'))
+"""
+
+def training_record(b):
+    """A SCORING_ROWS_SQL/FINAL_OUTCOME_SQL row as a hotel.csv record (DB categories mapped back)."""
+    record = {"Booking_ID": f"DB{b['booking_id']:08d}"}
+    record.update((col, b[col]) for col in RECORD_REQUIRED_COLUMNS)
+    for col, default in RECORD_OPTIONAL_COLUMNS.items():
+        if default is not None:  # total_nights / total_guests are derived, not hotel.csv columns
+            record[col] = b[col] if b[col] is not None else default
+    for feature, (_, mapping_dict, default_model_cat, _) in CATEGORY_FEATURES.items():
+        csv_column, db_column = RECORD_CATEGORY_COLUMNS[feature]
+        record[csv_column] = lookup_model_category(b[db_column], mapping_dict, default_model_cat)
+    record["booking_status"] = b["booking_status"]
+    return record
+
+def build_feature_matrix(bundle, bookings):
+    """Encode booking rows into one float64 matrix laid out in the bundle's `feature_cols` order.
+
+    Columns missing from a row are filled with 0, matching the old
+    per-row `reindex(columns=feature_cols, fill_value=0)`.
+    """
+    rows = []
+    for b in bookings:
+        meal_enc = encode_category(bundle, "type_of_meal_plan_encoded", b["meal_plan_name"])
+        # room_type_name is 'Unknown Room Type' if the room was deleted
+        room_enc = encode_category(bundle, "room_type_reserved_encoded", b["room_type_name"])
+        seg_enc = encode_category(bundle, "market_segment_type_encoded", b["segment_name"])
+        rows.append(feature_vector(bundle, booking_model_features(b, meal_enc, room_enc, seg_enc)))
+
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(bundle.feature_cols))
+
+def feature_hash(row):
+    """Hash of one encoded feature vector (a float64 row of build_feature_matrix)."""
+    return hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest()
+
+def forest_probabilities(bundle, X):
+    return bundle.forest.predict_proba(X)[:, 1]
+
+micro_batcher = MicroBatcher(
+    forest_probabilities,
+    max_batch=app.config["MICROBATCH_MAX_BATCH"],
+    max_wait_ms=app.config["MICROBATCH_MAX_WAIT_MS"],
+    max_queue=app.config["MICROBATCH_MAX_QUEUE"],
+)
+
+def predict_probabilities(bundle, X):
+    """Cancellation probabilities for the rows of X.
+
+    Small calls are micro-batched with concurrent ones, batches above
+    SKLEARN_BATCH_ROWS go to the sklearn model (same probabilities as the
+    flattened forest, faster on large batches) unless a compacted forest
+    is served, and everything else goes through the flattened forest.
+    """
+    if app.config["MICROBATCH_ENABLED"] and 0 < len(X) <= app.config["MICROBATCH_ROW_LIMIT"]:
+        return micro_batcher.predict(bundle, X)
+    if len(X) > app.config["SKLEARN_BATCH_ROWS"] and not bundle.compacted:
+        model = bundle.rf_model
+        if model is not None:
+            import pandas as pd  # only batch scoring needs it; keeps app startup light
+            return model.predict_proba(pd.DataFrame(X, columns=bundle.feature_cols))[:, 1]
+    return forest_probabilities(bundle, X)
+
+def cached_cancellation_probabilities(conn, bookings):
+    """Like predict_cancellation_probabilities, but served from booking_predictions."""
+    return cached_predictions(conn, bookings)[0]
+
+def cached_predictions(conn, bookings):
+    """(probabilities, explanations) for joined booking rows, served from booking_predictions.
+
+    Only bookings without a cached row for the current model version and
+    feature hash are scored; their probabilities and per-feature
+    contributions are computed in one batch and written back on `conn`.
+    Each explanation is {"bias": float, "values": [...]} in the bundle's
+    feature_cols order, or None when no model is loaded.
+    """
+    bundle = get_model_bundle()
+    if bundle.forest is None or not bookings:
+        return np.zeros(len(bookings)), [None] * len(bookings)
+
+    X = build_feature_matrix(bundle, bookings)
+    hashes = [feature_hash(row) for row in X]
+    query = """SELECT booking_id, feature_hash, cancellation_probability, contributions
+               FROM booking_predictions WHERE model_version = ?"""
+    params = [bundle.version]
+    if len(bookings) <= 500:
+        query += f" AND booking_id IN ({','.join('?' * len(bookings))})"
+        params += [b["booking_id"] for b in bookings]
+    cached = {
+        r["booking_id"]: (r["feature_hash"], r["cancellation_probability"], r["contributions"])
+        for r in conn.execute(query, params).fetchall()
+    }
+
+    probabilities = np.empty(len(bookings), dtype=np.float64)
+    explanations = [None] * len(bookings)
+    stale = []
+    for i, (b, h) in enumerate(zip(bookings, hashes)):
+        hit = cached.get(b["booking_id"])
+        if hit is not None and hit[0] == h and hit[2] is not None:
+            probabilities[i] = hit[1]
+            explanations[i] = json.loads(hit[2])
+        else:
+            stale.append(i)
+
+    if stale:
+        probabilities[stale] = predict_probabilities(bundle, X[stale])
+        bias, contributions = bundle.forest.contributions(X[stale])
+        for j, i in enumerate(stale):
+            explanations[i] = {"bias": round(float(bias[j]), 6),
+                               "values": [round(float(v), 6) for v in contributions[j]]}
+        conn.executemany("""
+            INSERT OR REPLACE INTO booking_predictions
+                (booking_id, feature_hash, model_version, cancellation_probability, contributions, scored_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, [(bookings[i]["booking_id"], hashes[i], bundle.version, float(probabilities[i]),
+               json.dumps(explanations[i])) for i in stale])
+        conn.commit()
+    return probabilities, explanations
+
+def top_factors(bundle, explanation, n=2):
+    """The `n` features pushing a booking most towards cancellation, as (feature, contribution)."""
+    if explanation is None:
+        return []
+    ranked = sorted(zip(bundle.feature_cols, explanation["values"]), key=lambda fv: fv[1], reverse=True)
+    return [(feature, value) for feature, value in ranked[:n] if value > 0]
+
+def invalidate_booking_predictions(conn, where_sql, params=()):
+    """Drop cached predictions for bookings matching `where_sql` (a WHERE clause on bookings).
+
+    Call before updating booking rows, inside the same transaction.
+    """
+    conn.execute(f"""
+        DELETE FROM booking_predictions
+        WHERE booking_id IN (SELECT booking_id FROM bookings WHERE {where_sql})
+    """, params)
+
+def score_bookings_by_id(booking_ids):
+    """Score the given bookings (if stale) and store the results in booking_predictions."""
+    if get_model_bundle().forest is None or not booking_ids:
+        return
+    conn = get_db_connection()
+    try:
+        for start in range(0, len(booking_ids), 500):
+            ids = booking_ids[start:start + 500]
+            rows = conn.execute(
+                SCORING_ROWS_SQL + f" WHERE b.booking_id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+            cached_cancellation_probabilities(conn, rows)
+    finally:
+        conn.close()
+
+def unscored_booking_ids(bundle):
+    """Bookings without a prediction for the bundle's model, i.e. the persistent scoring backlog."""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("""
+            SELECT b.booking_id FROM bookings b
+            LEFT JOIN booking_predictions p
+                   ON p.booking_id = b.booking_id AND p.model_version = ?
+            WHERE p.booking_id IS NULL
+            ORDER BY b.booking_id
+        """, (bundle.version,)).fetchall()
+    finally:
+        conn.close()
+    return [r[0] for r in rows]
+
+background_scorer = BackgroundScorer(
+    score_bookings_by_id,
+    workers=app.config["SCORING_WORKERS"],
+    batch_size=app.config["SCORING_BATCH_SIZE"],
+)
+
+def enqueue_booking_scoring(*booking_ids):
+    """Score bookings off the request path; admin pages then read the stored result."""
+    background_scorer.submit(booking_ids)
+
+_drain_lock = threading.Lock()
+
+def drain_scoring_backlog():
+    """Queue every booking without a prediction for the current model.
+
+    Waits for queue space rather than dropping ids, so run it on its own
+    thread (start_scoring_drain). Drains run one at a time.
+    """
+    with _drain_lock:
+        bundle = get_model_bundle()
+        if bundle.forest is not None:
+            background_scorer.submit(unscored_booking_ids(bundle), block=True)
+
+def start_scoring_drain():
+    threading.Thread(target=drain_scoring_backlog, name="scoring-backlog", daemon=True).start()
+
+@app.before_request
+def start_background_scoring():
+    """Start the scoring threads in serving processes and drain the backlog left by the last run.
+
+    The drain (which loads the model) runs on its own thread so the first
+    request does not wait for it.
+    """
+    if background_scorer.running:
+        return
+    background_scorer.start()
+    start_scoring_drain()
+
+# Raw API/CSV record columns: required, and optional with their bookings-table defaults
+RECORD_REQUIRED_COLUMNS = [
+    "no_of_adults", "no_of_children", "no_of_weekend_nights", "no_of_week_nights",
+    "lead_time", "arrival_year", "arrival_month", "arrival_date", "avg_price_per_room",
+]
+RECORD_OPTIONAL_COLUMNS = {
+    "required_car_parking_space": 0,
+    "repeated_guest": 0,
+    "no_of_previous_cancellations": 0,
+    "no_of_previous_bookings_not_canceled": 0,
+    "no_of_special_requests": 0,
+    "total_nights": None,
+    "total_guests": None,
+}
+# Encoded feature -> (hotel.csv column, DB name column) a raw record may carry it in
+RECORD_CATEGORY_COLUMNS = {
+    "type_of_meal_plan_encoded": ("type_of_meal_plan", "meal_plan_name"),
+    "room_type_reserved_encoded": ("room_type_reserved", "room_type_name"),
+    "market_segment_type_encoded": ("market_segment_type", "segment_name"),
+}
+
+def record_model_features(bundle, record):
+    """Model feature dict for a raw booking record in hotel.csv or DB column names.
+
+    Raises ValueError when a required column is missing or not numeric.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    values = {}
+    for col in RECORD_REQUIRED_COLUMNS:
+        if record.get(col) is None:
+            raise ValueError(f"missing field '{col}'")
+        values[col] = record[col]
+    for col, default in RECORD_OPTIONAL_COLUMNS.items():
+        value = record.get(col)
+        values[col] = default if value is None else value
+    for col, value in values.items():
+        if value is not None:
+            try:
+                values[col] = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"field '{col}' must be numeric")
+
+    codes = {}
+    for feature, (csv_col, db_col) in RECORD_CATEGORY_COLUMNS.items():
+        if record.get(feature) is not None:
+            try:
+                codes[feature] = int(record[feature])
+            except (TypeError, ValueError):
+                raise ValueError(f"field '{feature}' must be an integer code")
+        elif record.get(csv_col) is not None:
+            codes[feature] = encode_model_category(bundle, feature, record[csv_col])
+        else:
+            codes[feature] = encode_category(bundle, feature, record.get(db_col))
+
+    return booking_model_features(
+        values,
+        codes["type_of_meal_plan_encoded"],
+        codes["room_type_reserved_encoded"],
+        codes["market_segment_type_encoded"],
+    )
+
+def feature_vector(bundle, features):
+    return [features.get(col, 0) for col in bundle.feature_cols]
+
+# Medium risk, Likely to Cancel and High risk start above these probabilities; also the
+# predict_bucket() buckets, and imported by the compaction and benchmark scripts
+RISK_THRESHOLDS = (0.4, 0.5, 0.7)
+
+def risk_assessment(prob):
+    """(prediction label, risk level) for a cancellation probability."""
+    medium, cancel, high = RISK_THRESHOLDS
+    prediction = "Likely to Cancel" if prob > cancel else "Likely to NOT Cancel"
+    risk_level = "High" if prob > high else "Medium" if prob > medium else "Low"
+    return prediction, risk_level
+
+def predict_cancellation_probabilities(bookings):
+    """Score all bookings in one vectorized pass over the flattened forest; 0.0 when no model is loaded."""
+    bundle = get_model_bundle()
+    if bundle.forest is None or not bookings:
+        return np.zeros(len(bookings))
+    return predict_probabilities(bundle, build_feature_matrix(bundle, bookings))
+
 # ========================================
 # KHALTI PAYMENT ROUTES
 # ========================================
@@ -627,25 +1432,11 @@ def view_room(room_id):
     # Fetch meal plans
     meal_plans = conn.execute("SELECT * FROM meal_plans").fetchall()
     
-    # Precompute unavailable ranges for display
-    booked_rows = conn.execute("""
-        SELECT arrival_year, arrival_month, arrival_date,
-               total_nights, no_of_weekend_nights, no_of_week_nights
-        FROM bookings
-        WHERE room_id = ? AND booking_status = 'Not_Canceled'
-    """, (room_id,)).fetchall()
+    # Unavailable ranges from today on, for display
+    unavailable_ranges, _ = room_availability(conn, room_id)
+    unavailable_ranges = ranges_in_window(unavailable_ranges, datetime.now().date().isoformat())
     conn.close()
     
-    unavailable_ranges = []
-    for r in booked_rows:
-        start, end, total_nights = booking_window_from_row(r)
-        if total_nights <= 0:
-            continue
-        unavailable_ranges.append({
-            "start": start.isoformat(),
-            "end": end.isoformat()
-        })
-    
     return render_template("view_room.html", room=room, meal_plans=meal_plans, unavailable_ranges=unavailable_ranges)
 
 @app.route("/logout")
@@ -781,15 +1572,15 @@ def book_room(room_id):
             if not is_room_available(booking_data['room_id'], checkin, checkout):
                 return jsonify({"success": False, "message": "Room unavailable for selected dates."}), 400
 
-            conn.execute("""
+            cur = conn.execute("""
                 INSERT INTO bookings (
                     customer_id, room_id, meal_plan_id, market_segment_id, booking_status,
                     no_of_adults, no_of_children, no_of_weekend_nights, no_of_week_nights,
                     lead_time, arrival_year, arrival_month, arrival_date,
                     avg_price_per_room, no_of_special_requests, required_car_parking_space,
                     repeated_guest, no_of_previous_cancellations, no_of_previous_bookings_not_canceled,
-                    total_nights, total_guests
-                ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                    total_nights, total_guests, checkin_date, checkout_date
+                ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
             """, (
                 customer_id, booking_data['room_id'], booking_data['meal_plan_id'], 
                 booking_data['market_segment_id'], "Not_Canceled",
@@ -801,10 +1592,20 @@ def book_room(room_id):
                 booking_data.get('required_car_parking_space', 0),
                 booking_data.get('repeated_guest', 0), booking_data.get('no_of_previous_cancellations', 0),
                 booking_data.get('no_of_previous_bookings_not_canceled', 0),
-                total_nights, booking_data['total_guests']
+                total_nights, booking_data['total_guests'],
+                checkin.isoformat(), checkout.isoformat()
             ))
+            try:
+                claim_room_nights(conn, cur.lastrowid, booking_data['room_id'], checkin, checkout)
+            except sqlite3.IntegrityError:
+                # Another booking took one of the nights since the availability check
+                conn.rollback()
+                conn.close()
+                return jsonify({"success": False, "message": "Room unavailable for selected dates."}), 400
+            invalidate_room_availability(conn, booking_data['room_id'])
             conn.commit()
             conn.close()
+            enqueue_booking_scoring(cur.lastrowid)
             return jsonify({"success": True, "message": f"Room {booking_data['room_number']} booked! Pay at reception."})
         except Exception as e:
             conn.rollback()
@@ -812,25 +1613,11 @@ def book_room(room_id):
             print(f"Offline booking failed: {e}")
             return jsonify({"success": False, "message": "Booking failed."}), 400
 
-    # Precompute unavailable ranges for display
-    booked_rows = conn.execute("""
-        SELECT arrival_year, arrival_month, arrival_date,
-               total_nights, no_of_weekend_nights, no_of_week_nights
-        FROM bookings
-        WHERE room_id = ? AND booking_status = 'Not_Canceled'
-    """, (room_id,)).fetchall()
+    # Unavailable ranges from today on, for display
+    unavailable_ranges, _ = room_availability(conn, room_id)
+    unavailable_ranges = ranges_in_window(unavailable_ranges, datetime.now().date().isoformat())
     conn.close()
 
-    unavailable_ranges = []
-    for r in booked_rows:
-        start, end, total_nights = booking_window_from_row(r)
-        if total_nights <= 0:
-            continue
-        unavailable_ranges.append({
-            "start": start.isoformat(),
-            "end": end.isoformat()
-        })
-
     return render_template(
         "book_room.html", 
         room=room, 
@@ -879,12 +1666,16 @@ def cancel_booking(booking_id):
         flash("Already canceled.", "info")
         conn.close()
         return redirect(url_for("my_bookings"))
+    invalidate_booking_predictions(conn, "booking_id = ?", (booking_id,))
     conn.execute(
         "UPDATE bookings SET booking_status = 'Canceled', updated_at = CURRENT_TIMESTAMP WHERE booking_id = ?",
         (booking_id,)
     )
+    release_room_nights(conn, booking)
+    invalidate_room_availability(conn, booking["room_id"])
     conn.commit()
     conn.close()
+    enqueue_booking_scoring(booking_id)
     flash("Booking canceled successfully.", "success")
     return redirect(url_for("my_bookings"))
 
@@ -968,15 +1759,17 @@ def manage_room_types():
         name = request.form["room_type_name"]
         desc = request.form.get("description", "")
         price = request.form.get("price_per_night", 0)
+        max_guests = request.form.get("max_guests", type=int)
         file = request.files.get("image_file")
         img_filename = None
         if file and allowed_file(file.filename):
             img_filename = secure_filename(file.filename)
             file.save(os.path.join(app.config["UPLOAD_FOLDER"], img_filename))
         try:
-            conn.execute("INSERT INTO room_types (room_type_name,description,price_per_night,image_path) VALUES (?,?,?,?)",
-                         (name, desc, price, img_filename))
+            conn.execute("INSERT INTO room_types (room_type_name,description,price_per_night,image_path,max_guests) VALUES (?,?,?,?,?)",
+                         (name, desc, price, img_filename, max_guests))
             conn.commit()
+            refresh_encoding_tables()
             flash("Room type added!", "success")
         except sqlite3.IntegrityError:
             flash("Room type exists!", "danger")
@@ -1072,6 +1865,7 @@ def manage_meal_plans():
         """, (meal_plan_name, image_filename))
 
         conn.commit()
+        refresh_encoding_tables()
         flash("Meal plan added!", "success")
         return redirect(url_for("manage_meal_plans"))
 
@@ -1145,8 +1939,12 @@ def delete_meal_plan(meal_id):
                 return redirect(url_for("delete_meal_plan", meal_id=meal_id))
             
             # Reassign bookings
+            reassigned_ids = [r[0] for r in conn.execute(
+                "SELECT booking_id FROM bookings WHERE meal_plan_id = ?", (meal_id,)
+            ).fetchall()]
+            invalidate_booking_predictions(conn, "meal_plan_id = ?", (meal_id,))
             conn.execute(
-                "UPDATE bookings SET meal_plan_id = ? WHERE meal_plan_id = ?",
+                "UPDATE bookings SET meal_plan_id = ?, updated_at = CURRENT_TIMESTAMP WHERE meal_plan_id = ?",
                 (reassign_to, meal_id)
             )
 
@@ -1164,7 +1962,9 @@ def delete_meal_plan(meal_id):
             )
 
             conn.commit()
+            refresh_encoding_tables()
             if bookings_count > 0:
+                enqueue_booking_scoring(*reassigned_ids)
                 flash(f"Meal plan deleted successfully! {bookings_count} booking(s) reassigned.", "success")
             else:
                 flash("Meal plan deleted successfully!", "success")
@@ -1194,6 +1994,7 @@ def delete_meal_plan(meal_id):
         )
 
         conn.commit()
+        refresh_encoding_tables()
         flash("Meal plan deleted successfully!", "success")
     except sqlite3.IntegrityError as e:
         conn.rollback()
@@ -1219,6 +2020,7 @@ def manage_market_segments():
         try:
             conn.execute("INSERT INTO market_segments (segment_name) VALUES (?)", (name,))
             conn.commit()
+            refresh_encoding_tables()
             flash("Segment added!", "success")
         except sqlite3.IntegrityError:
             flash("Segment exists!", "danger")
@@ -1272,68 +2074,222 @@ def admin_view_bookings():
         ORDER BY b.created_at DESC
     """).fetchall()
 
-    booking_preds = []
-
-    # === Your prediction code stays 100% unchanged ===
-    meal_encoder = encoders.get("type_of_meal_plan") or encoders.get("type_of_meal_plan_encoded")
-    room_encoder = encoders.get("room_type_reserved") or encoders.get("room_type_reserved_encoded")
-    seg_encoder = encoders.get("market_segment_type") or encoders.get("market_segment_type_encoded")
-
-    for b in bookings:
-        meal_enc = map_and_encode(
-            b["meal_plan_name"],
-            MEAL_MAP,
-            meal_encoder,
-            default_model_cat="Not Selected"
-        )
-        room_enc = map_and_encode(
-            b["room_type_name"],        # ← This will be 'Unknown Room Type' if room deleted
-            ROOM_MAP,
-            room_encoder,
-            default_model_cat="Room_Type 1"
-        )
-        seg_enc = map_and_encode(
-            b["segment_name"],
-            SEGMENT_MAP,
-            seg_encoder,
-            default_model_cat="Offline"
-        )
-
-        df_input = pd.DataFrame([{
-            "no_of_adults": b["no_of_adults"],
-            "no_of_children": b["no_of_children"],
-            "no_of_weekend_nights": b["no_of_weekend_nights"],
-            "no_of_week_nights": b["no_of_week_nights"],
-            "required_car_parking_space": b["required_car_parking_space"],
-            "lead_time": b["lead_time"],
-            "arrival_year": b["arrival_year"],
-            "arrival_month": b["arrival_month"],
-            "arrival_date": b["arrival_date"],
-            "repeated_guest": b["repeated_guest"],
-            "no_of_previous_cancellations": b["no_of_previous_cancellations"],
-            "no_of_previous_bookings_not_canceled": b["no_of_previous_bookings_not_canceled"],
-            "avg_price_per_room": b["avg_price_per_room"],
-            "no_of_special_requests": b["no_of_special_requests"],
-            "type_of_meal_plan_encoded": meal_enc,
-            "room_type_reserved_encoded": room_enc,
-            "market_segment_type_encoded": seg_enc,
-            "total_nights": b["total_nights"] if b["total_nights"] is not None else (b["no_of_weekend_nights"] + b["no_of_week_nights"]),
-            "total_guests": b["total_guests"] if b["total_guests"] is not None else (b["no_of_adults"] + b["no_of_children"])
-        }])
-
-        df_input = df_input.reindex(columns=feature_cols, fill_value=0)
-        prob = rf_model.predict_proba(df_input)[0, 1] if rf_model is not None else 0.0
+    probabilities, explanations = cached_predictions(conn, bookings)
+    bundle = get_model_bundle()
 
+    booking_preds = []
+    for b, prob, explanation in zip(bookings, probabilities, explanations):
+        prediction, risk_level = risk_assessment(prob)
         booking_preds.append({
             "booking_id": b["booking_id"],
             "cancellation_probability": round(prob, 3),
-            "prediction": "Likely to Cancel" if prob > 0.5 else "Likely to NOT Cancel",
-            "risk_level": "High" if prob > 0.7 else "Medium" if prob > 0.4 else "Low",
+            "prediction": prediction,
+            "risk_level": risk_level,
+            "top_factors": top_factors(bundle, explanation),
         })
 
     conn.close()
     return render_template("admin_bookings.html", bookings=bookings, bookings_combined=zip(bookings, booking_preds))
 
+# -----------------------
+# API: BATCH PREDICTION
+# -----------------------
+NDJSON_MIMETYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-seq"}
+
+def iter_ndjson_records():
+    """Yield one parsed record per non-empty body line, without buffering the body.
+
+    application/json-seq (RFC 7464) records start with an RS byte, which is stripped.
+    """
+    for line in request.stream:
+        line = line.strip(b"\x1e \t\r\n")
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield ValueError("invalid JSON")
+
+def score_records(records, bundle=None):
+    """Score raw booking records with one model call.
+
+    Returns one (probability, error) pair per record, in order; exactly one
+    of the two is None. Records may be exceptions (e.g. unparsable input),
+    which are reported as errors.
+    """
+    bundle = bundle or get_model_bundle()
+    X, results = record_matrix(bundle, records)
+    probabilities = predict_probabilities(bundle, X) if len(X) else []
+    return [
+        (None, error) if error is not None else (float(probabilities[row]), None)
+        for row, error in results
+    ]
+
+def record_matrix(bundle, records):
+    """Feature matrix of the valid records, plus one (row, error) pair per record."""
+    results = []
+    rows = []
+    for record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            rows.append(feature_vector(bundle, record_model_features(bundle, record)))
+        except ValueError as e:
+            results.append((None, str(e)))
+        else:
+            results.append((len(rows) - 1, None))
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(bundle.feature_cols)), results
+
+# The risk_assessment() of each predict_bucket() bucket for RISK_THRESHOLDS
+BUCKET_ASSESSMENTS = [
+    risk_assessment((lo + hi) / 2) for lo, hi in zip((0.0,) + RISK_THRESHOLDS, RISK_THRESHOLDS + (1.0,))
+]
+early_exit_stats = {"rows": 0, "trees_evaluated": 0}
+_early_exit_lock = threading.Lock()
+
+def bucket_records(records, bundle, delta=None):
+    """Like score_records, but only resolves each record's risk bucket (early-exit forest evaluation).
+
+    Returns one (bucket, trees evaluated, error) triple per record.
+    """
+    X, results = record_matrix(bundle, records)
+    if len(X):
+        buckets, trees = bundle.forest.predict_bucket(X, RISK_THRESHOLDS, delta=delta)
+        with _early_exit_lock:
+            early_exit_stats["rows"] += len(X)
+            early_exit_stats["trees_evaluated"] += int(trees.sum())
+    return [
+        (None, None, error) if error is not None else (int(buckets[row]), int(trees[row]), None)
+        for row, error in results
+    ]
+
+def record_booking_id(record):
+    if isinstance(record, dict):
+        return record.get("booking_id", record.get("Booking_ID"))
+    return None
+
+def score_record_chunk(chunk, bundle, buckets=False, delta=None):
+    """Score [(index, record), ...] and render the results as NDJSON lines."""
+    records = [record for _, record in chunk]
+    if buckets:
+        scores = bucket_records(records, bundle, delta)
+    else:
+        scores = [(prob, None, error) for prob, error in score_records(records, bundle)]
+    lines = []
+    for (index, record), (result, trees, error) in zip(chunk, scores):
+        out = {"index": index}
+        booking_id = record_booking_id(record)
+        if booking_id is not None:
+            out["booking_id"] = booking_id
+        if error is not None:
+            out["error"] = error
+        elif trees is None:
+            out["cancellation_probability"] = result
+            out["prediction"], out["risk_level"] = risk_assessment(result)
+            out["model_version"] = bundle.version
+        else:
+            out["prediction"], out["risk_level"] = BUCKET_ASSESSMENTS[result]
+            out["trees_evaluated"] = trees
+            out["model_version"] = bundle.version
+        lines.append(json.dumps(out))
+    return "\n".join(lines) + "\n"
+
+@app.route("/api/predict/batch", methods=["POST"])
+@api_admin_required
+def api_predict_batch():
+    """Score raw booking records sent as a JSON array or an NDJSON stream.
+
+    Records may use hotel.csv columns (type_of_meal_plan='Meal Plan 1', ...)
+    or DB names (meal_plan_name='Veg', ...). Results stream back as NDJSON,
+    one line per input record in input order, scored and flushed in chunks.
+    The whole response is scored by the model version active when it started.
+
+    ?mode=bucket returns only prediction and risk level, evaluating trees
+    until the bucket is certain (trees_evaluated per line); &delta=0.01
+    also stops when a change is that unlikely.
+    """
+    bundle = get_model_bundle()
+    if bundle.forest is None:
+        return jsonify({"success": False, "error": "Model not loaded"}), 503
+
+    if request.mimetype in NDJSON_MIMETYPES:
+        records = iter_ndjson_records()
+    else:
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            return jsonify({"success": False, "error": "Expected a JSON array or NDJSON body"}), 400
+
+    buckets = request.args.get("mode") == "bucket"
+    delta = request.args.get("delta", type=float)
+    if delta is not None and not 0 < delta < 1:
+        return jsonify({"success": False, "error": "delta must be between 0 and 1"}), 400
+
+    chunk_size = app.config["PREDICT_STREAM_CHUNK"]
+
+    def generate():
+        chunk = []
+        for index, record in enumerate(records):
+            chunk.append((index, record))
+            if len(chunk) >= chunk_size:
+                yield score_record_chunk(chunk, bundle, buckets, delta)
+                chunk = []
+        if chunk:
+            yield score_record_chunk(chunk, bundle, buckets, delta)
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+# -----------------------
+# API: MODEL REGISTRY AND SCORING STATUS
+# -----------------------
+@app.route("/api/admin/model", methods=["GET"])
+@api_admin_required
+def api_model_status():
+    """Loaded and active model versions, reload state and the published versions."""
+    bundle = _model_bundle
+    return jsonify({
+        "success": True,
+        "loaded_version": bundle.version if bundle is not None else None,
+        "active_version": model_registry.active_version(MODEL_DIR),
+        "loading": model_reload_status["loading"],
+        "last_error": model_reload_status["last_error"],
+        "versions": model_registry.list_versions(MODEL_DIR),
+    })
+
+@app.route("/api/admin/model/activate", methods=["POST"])
+@api_admin_required
+def api_activate_model():
+    """Activate a published version: verify it, repoint ACTIVE and load it in the background.
+
+    Other worker processes follow the ACTIVE pointer on their next check.
+    """
+    version = (request.get_json(silent=True) or {}).get("version")
+    if not version:
+        return jsonify({"success": False, "error": "Missing version"}), 400
+    try:
+        model_registry.activate(MODEL_DIR, version)
+    except model_registry.RegistryError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    start_model_reload(version)
+    return jsonify({"success": True, "version": version, "status": "loading"}), 202
+
+@app.route("/api/admin/scoring/stats", methods=["GET"])
+@api_admin_required
+def api_scoring_stats():
+    """Micro-batcher, background scorer and early-exit counters for this process."""
+    return jsonify({
+        "success": True,
+        "micro_batcher": dict(micro_batcher.stats(), enabled=app.config["MICROBATCH_ENABLED"],
+                              row_limit=app.config["MICROBATCH_ROW_LIMIT"]),
+        "background_scorer": {
+            "queue_depth": background_scorer.queue.qsize(),
+            "scored": background_scorer.scored,
+            "failed": background_scorer.failed,
+            "dropped": background_scorer.dropped,
+        },
+        "early_exit": dict(early_exit_stats, avg_trees_evaluated=round(
+            early_exit_stats["trees_evaluated"] / early_exit_stats["rows"], 2) if early_exit_stats["rows"] else None),
+    })
+
 # -----------------------
 # ADMIN: VIEW BOOKING FEATURES
 # -----------------------
@@ -1352,20 +2308,19 @@ def admin_view_booking_features(booking_id):
         JOIN market_segments s ON b.market_segment_id = s.market_segment_id
         WHERE b.booking_id=?
     """, (booking_id,)).fetchone()
-    conn.close()
-
     if not b:
+        conn.close()
         flash("Booking not found!", "danger")
         return redirect(url_for("admin_view_bookings"))
 
-    # Encode features
-    meal_encoder = encoders.get("type_of_meal_plan") or encoders.get("type_of_meal_plan_encoded")
-    room_encoder = encoders.get("room_type_reserved") or encoders.get("room_type_reserved_encoded")
-    seg_encoder = encoders.get("market_segment_type") or encoders.get("market_segment_type_encoded")
+    probabilities, explanations = cached_predictions(conn, [b])
+    conn.close()
 
-    meal_enc = map_and_encode(b["meal_plan_name"], MEAL_MAP, meal_encoder, "Not Selected")
-    room_enc = map_and_encode(b["room_type_name"], ROOM_MAP, room_encoder, "Room_Type 1")
-    seg_enc = map_and_encode(b["segment_name"], SEGMENT_MAP, seg_encoder, "Offline")
+    # Encode features
+    bundle = get_model_bundle()
+    meal_enc = encode_category(bundle, "type_of_meal_plan_encoded", b["meal_plan_name"])
+    room_enc = encode_category(bundle, "room_type_reserved_encoded", b["room_type_name"])
+    seg_enc = encode_category(bundle, "market_segment_type_encoded", b["segment_name"])
 
     features = {
         "no_of_adults": b["no_of_adults"],
@@ -1389,7 +2344,17 @@ def admin_view_booking_features(booking_id):
         "total_guests": b["no_of_adults"] + b["no_of_children"]
     }
 
-    return render_template("admin_booking_features.html", booking=b, features=features)
+    # Per-feature contributions to the prediction, biggest effect first
+    explanation = explanations[0]
+    contributions = {}
+    if explanation is not None:
+        contributions = dict(sorted(zip(bundle.feature_cols, explanation["values"]),
+                                    key=lambda fv: abs(fv[1]), reverse=True))
+    return render_template(
+        "admin_booking_features.html", booking=b, features=features, contributions=contributions,
+        bias=explanation["bias"] if explanation else None, probability=float(probabilities[0]),
+        units=bundle.forest.CONTRIBUTION_UNITS if bundle.forest is not None else None,
+    )
 
 
 # -----------------------
@@ -1398,4 +2363,4 @@ def admin_view_booking_features(booking_id):
 if __name__ == "__main__":
     # Debug can be toggled via FLASK_DEBUG=true; default is off for safety
     debug_mode = str(os.getenv("FLASK_DEBUG", "")).lower() in ("1", "true", "yes")
-    app.run(debug=debug_mode)
+    create_app().run(debug=debug_mode)
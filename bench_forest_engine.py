@@ -0,0 +1,108 @@
+# bench_forest_engine.py - latency of the pickled RF vs the flattened forest
+"""
+Usage: python bench_forest_engine.py [--rows N] [--repeat R]
+
+Encodes hotel.csv with the saved encoders, checks that FlatForest returns
+bit-identical probabilities to the pickled model (n_jobs=1), then times
+single-row and batch scoring for both. Finally reports how often early-exit
+bucket scoring (FlatForest.predict_bucket) agrees with the full evaluation
+and how many trees it needed; tests/test_forest_engine.py asserts the exact
+mode's agreement. Exits non-zero if the probabilities are not identical.
+"""
+import argparse
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app import RISK_THRESHOLDS
+from forest_engine import FlatForest
+
+MODEL_PATH = "model_files/random_forest_model.pkl"
+ENCODERS_PATH = "model_files/encoders.pkl"
+FEATURE_COLS_PATH = "model_files/feature_cols.pkl"
+
+
+def load_features(feature_cols, encoders, csv_path="hotel.csv"):
+    df = pd.read_csv(csv_path)
+    for col, le in encoders.items():
+        df[col + "_encoded"] = le.transform(df[col])
+    df["total_nights"] = df["no_of_weekend_nights"] + df["no_of_week_nights"]
+    df["total_guests"] = df["no_of_adults"] + df["no_of_children"]
+    return df[feature_cols]
+
+
+def time_calls(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200, help="distinct rows used for single-row timing")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions per batch size")
+    args = parser.parse_args()
+
+    with open(MODEL_PATH, "rb") as f:
+        rf_model = pickle.load(f)
+    with open(ENCODERS_PATH, "rb") as f:
+        encoders = pickle.load(f)
+    with open(FEATURE_COLS_PATH, "rb") as f:
+        feature_cols = pickle.load(f)
+
+    X_df = load_features(feature_cols, encoders)
+    X = X_df.to_numpy(dtype=np.float64)
+
+    start = time.perf_counter()
+    forest = FlatForest.from_sklearn(rf_model)
+    print(f"Flattened {forest.n_trees} trees / {forest.n_nodes} nodes in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rf_model.n_jobs = 1
+    identical = np.array_equal(rf_model.predict_proba(X_df), forest.predict_proba(X))
+    print(f"Bit-identical probabilities on {len(X)} rows: {identical}")
+
+    print("\nSingle-row latency (ms)")
+    print(f"{'engine':<22}{'p50':>10}{'p95':>10}{'p99':>10}")
+    rows = X_df.iloc[:args.rows]
+    for n_jobs in (-1, 1):
+        rf_model.n_jobs = n_jobs
+        it = iter(range(len(rows)))
+        t = time_calls(lambda: rf_model.predict_proba(rows.iloc[[next(it)]]), len(rows))
+        print(f"{'sklearn n_jobs=' + str(n_jobs):<22}{np.percentile(t, 50):>10.3f}{np.percentile(t, 95):>10.3f}{np.percentile(t, 99):>10.3f}")
+    it = iter(range(len(rows)))
+    t = time_calls(lambda: forest.predict_proba(X[next(it)]), len(rows))
+    print(f"{'FlatForest':<22}{np.percentile(t, 50):>10.3f}{np.percentile(t, 95):>10.3f}{np.percentile(t, 99):>10.3f}")
+
+    print("\nBatch throughput (rows/s)")
+    print(f"{'batch':>8}{'sklearn n_jobs=1':>20}{'FlatForest':>14}")
+    rf_model.n_jobs = 1
+    for size in (10, 100, 1000, 10000, len(X)):
+        batch_df, batch = X_df.iloc[:size], X[:size]
+        sk = np.median(time_calls(lambda: rf_model.predict_proba(batch_df), args.repeat)) / 1000.0
+        ff = np.median(time_calls(lambda: forest.predict_proba(batch), args.repeat)) / 1000.0
+        print(f"{size:>8}{size / sk:>20,.0f}{size / ff:>14,.0f}")
+
+    print(f"\nEarly-exit buckets on {len(X)} rows (thresholds {RISK_THRESHOLDS})")
+    print(f"{'mode':<22}{'agreement':>12}{'avg trees':>12}{'time (s)':>10}")
+    start = time.perf_counter()
+    full = np.sum(forest.predict_proba(X)[:, 1][:, np.newaxis] > np.array(RISK_THRESHOLDS), axis=1)
+    print(f"{'full evaluation':<22}{1.0:>12.4%}{forest.n_trees:>12.1f}{time.perf_counter() - start:>10.2f}")
+    for delta in (None, 1e-3, 1e-2):
+        start = time.perf_counter()
+        buckets, trees = forest.predict_bucket(X, RISK_THRESHOLDS, delta=delta)
+        elapsed = time.perf_counter() - start
+        agreement = np.mean(buckets == full)
+        print(f"{'exact' if delta is None else f'delta={delta:g}':<22}{agreement:>12.4%}{trees.mean():>12.1f}{elapsed:>10.2f}")
+
+    if not identical:
+        sys.exit("FAILED: flattened forest disagrees with the full model")
+
+
+if __name__ == "__main__":
+    main()
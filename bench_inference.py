@@ -0,0 +1,248 @@
+# bench_inference.py - latency, throughput and memory of every scoring path
+"""
+Usage:
+    python bench_inference.py [-o bench_inference.json] [--single-rows 1000]
+                              [--batch-sizes 1,10,100,1000,10000,100000]
+                              [--per-row-max-batch 1000] [--seed 0]
+
+Scores the same seeded sample of hotel.csv rows (drawn with replacement
+when a batch is larger than the file) through each path, in the input
+format that path takes:
+
+  notebook predict_cancellation   train.ipynb's function, verbatim (reloads the pickles per call)
+  admin per-row DataFrame         the original admin_view_bookings loop: map_and_encode x3,
+                                  a one-row DataFrame and rf_model.predict_proba per booking
+  map_and_encode x3               category encoding alone, as the original loop did it
+  encode_category x3              the current table lookup that replaced it
+  build_feature_matrix + forest   the current admin list path (cache misses)
+  score_records                   the /api/predict/batch path
+  predict_probabilities           the micro-batched path, called from one thread
+  FlatForest.predict_proba        the engine alone, on encoded rows
+  FlatForest.predict_bucket       early-exit risk buckets, on encoded rows
+  sklearn predict_proba           the pickled model on an encoded DataFrame (n_jobs=1)
+
+For each path it reports p50/p95/p99 single-row latency over --single-rows
+distinct rows, rows/s at each batch size (per-row paths only up to
+--per-row-max-batch) and peak Python/numpy allocation per call (tracemalloc).
+It also checks that every probability path agrees with the pickled model.
+Results go to a JSON file together with the git commit and library versions.
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import app as hotel_app
+from bench_training import environment
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# hotel.csv category -> DB name, to turn sampled rows into bookings-table rows
+DB_NAMES = {
+    csv_col: {model_cat: db_name for db_name, model_cat in reversed(mapping.items())}
+    for csv_col, mapping in (("type_of_meal_plan", hotel_app.MEAL_MAP),
+                             ("room_type_reserved", hotel_app.ROOM_MAP),
+                             ("market_segment_type", hotel_app.SEGMENT_MAP))
+}
+
+
+def notebook_predict_cancellation(booking_data, model_dir):
+    """train.ipynb's predict_cancellation, unchanged apart from the model directory."""
+    rf_model = pickle.load(open(os.path.join(model_dir, "random_forest_model.pkl"), "rb"))
+    encoders = pickle.load(open(os.path.join(model_dir, "encoders.pkl"), "rb"))
+    feature_cols = pickle.load(open(os.path.join(model_dir, "feature_cols.pkl"), "rb"))
+
+    df_input = pd.DataFrame([booking_data])
+    for col in ['type_of_meal_plan', 'room_type_reserved', 'market_segment_type']:
+        if col in df_input.columns:
+            value = df_input[col].iloc[0]
+            if value in encoders[col].classes_:
+                df_input[col + '_encoded'] = encoders[col].transform(df_input[col])
+            else:
+                df_input[col + '_encoded'] = -1
+    df_input['total_nights'] = df_input['no_of_weekend_nights'] + df_input['no_of_week_nights']
+    df_input['total_guests'] = df_input['no_of_adults'] + df_input['no_of_children']
+    X_input = df_input[feature_cols]
+    probability = rf_model.predict_proba(X_input)[0, 1]
+    return {
+        'cancellation_probability': probability,
+        'prediction': 'Likely to Cancel' if probability > 0.5 else 'Likely to NOT Cancel',
+        'risk_level': 'High' if probability > 0.7 else 'Medium' if probability > 0.4 else 'Low',
+    }
+
+
+def original_encodings(bundle, b):
+    meal_encoder = bundle.encoders.get("type_of_meal_plan")
+    room_encoder = bundle.encoders.get("room_type_reserved")
+    seg_encoder = bundle.encoders.get("market_segment_type")
+    return (
+        hotel_app.map_and_encode(b["meal_plan_name"], hotel_app.MEAL_MAP, meal_encoder, default_model_cat="Not Selected"),
+        hotel_app.map_and_encode(b["room_type_name"], hotel_app.ROOM_MAP, room_encoder, default_model_cat="Room_Type 1"),
+        hotel_app.map_and_encode(b["segment_name"], hotel_app.SEGMENT_MAP, seg_encoder, default_model_cat="Offline"),
+    )
+
+
+def original_admin_row(bundle, b):
+    """One iteration of the original admin_view_bookings loop."""
+    meal_enc, room_enc, seg_enc = original_encodings(bundle, b)
+    df_input = pd.DataFrame([hotel_app.booking_model_features(b, meal_enc, room_enc, seg_enc)])
+    df_input = df_input.reindex(columns=bundle.feature_cols, fill_value=0)
+    return bundle.rf_model.predict_proba(df_input)[0, 1]
+
+
+def sample_inputs(n, seed, bundle):
+    """n seeded hotel.csv rows as records, bookings-table rows, a float64 matrix and a DataFrame."""
+    df = pd.read_csv(os.path.join(BASE_DIR, "hotel.csv"))
+    rng = np.random.default_rng(seed)
+    df = df.iloc[rng.choice(len(df), size=n, replace=n > len(df))].reset_index(drop=True)
+    records = df.drop(columns=["Booking_ID", "booking_status"]).to_dict("records")
+    bookings = []
+    for i, r in enumerate(records):
+        b = dict(r, booking_id=i, total_nights=None, total_guests=None)
+        b["meal_plan_name"] = DB_NAMES["type_of_meal_plan"][r["type_of_meal_plan"]]
+        b["room_type_name"] = DB_NAMES["room_type_reserved"][r["room_type_reserved"]]
+        b["segment_name"] = DB_NAMES["market_segment_type"][r["market_segment_type"]]
+        bookings.append(b)
+    X = hotel_app.record_matrix(bundle, records)[0]
+    return {"records": records, "bookings": bookings, "X": X,
+            "X_df": pd.DataFrame(X, columns=bundle.feature_cols)}
+
+
+def scoring_paths(bundle):
+    """(name, input kind, per-row path?, returns probabilities?, fn(batch))."""
+    model_dir = os.path.dirname(bundle.model_path)
+    rf_model = bundle.rf_model
+    forest = bundle.forest
+    return [
+        ("notebook predict_cancellation", "records", True, True,
+         lambda batch: [notebook_predict_cancellation(r, model_dir)["cancellation_probability"] for r in batch]),
+        ("admin per-row DataFrame", "bookings", True, True,
+         lambda batch: [original_admin_row(bundle, b) for b in batch]),
+        ("map_and_encode x3", "bookings", True, False,
+         lambda batch: [original_encodings(bundle, b) for b in batch]),
+        ("encode_category x3", "bookings", True, False,
+         lambda batch: [tuple(hotel_app.encode_category(bundle, feature, b[column])
+                              for feature, column in (("type_of_meal_plan_encoded", "meal_plan_name"),
+                                                      ("room_type_reserved_encoded", "room_type_name"),
+                                                      ("market_segment_type_encoded", "segment_name")))
+                        for b in batch]),
+        ("build_feature_matrix + forest", "bookings", False, True,
+         lambda batch: hotel_app.forest_probabilities(bundle, hotel_app.build_feature_matrix(bundle, batch))),
+        ("score_records", "records", False, True,
+         lambda batch: [p for p, _ in hotel_app.score_records(batch, bundle)]),
+        ("predict_probabilities", "X", False, True,
+         lambda batch: hotel_app.predict_probabilities(bundle, batch)),
+        ("FlatForest.predict_proba", "X", False, True,
+         lambda batch: forest.predict_proba(batch)[:, 1]),
+        ("FlatForest.predict_bucket", "X", False, False,
+         lambda batch: forest.predict_bucket(batch, hotel_app.RISK_THRESHOLDS)[0]),
+        ("sklearn predict_proba", "X_df", False, True,
+         lambda batch: rf_model.predict_proba(batch)[:, 1]),
+    ]
+
+
+def take(inputs, kind, start, stop):
+    data = inputs[kind]
+    return data.iloc[start:stop] if kind == "X_df" else data[start:stop]
+
+
+def single_row_latency(fn, inputs, kind, n):
+    timings = []
+    for i in range(n):
+        row = take(inputs, kind, i, i + 1)
+        start = time.perf_counter()
+        fn(row)
+        timings.append(time.perf_counter() - start)
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000.0
+    return {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+
+
+def throughput(fn, inputs, kind, size, min_seconds=0.2, max_repeat=20):
+    """rows/s for one batch size (median over repeats totalling at least `min_seconds`)."""
+    batch = take(inputs, kind, 0, size)
+    timings = []
+    while len(timings) < max_repeat and (sum(timings) < min_seconds or len(timings) < 3):
+        start = time.perf_counter()
+        fn(batch)
+        timings.append(time.perf_counter() - start)
+        if timings[-1] > 5 * min_seconds:
+            break
+    return size / float(np.median(timings))
+
+
+def peak_allocation(fn, inputs, kind, size):
+    batch = take(inputs, kind, 0, size)
+    tracemalloc.start()
+    fn(batch)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", default="bench_inference.json", help="results file")
+    parser.add_argument("--single-rows", type=int, default=1000, help="rows timed one at a time per path")
+    parser.add_argument("--slow-rows", type=int, default=50,
+                        help="rows timed for the notebook path, which reloads the model per call")
+    parser.add_argument("--batch-sizes", type=lambda v: [int(s) for s in v.split(",")],
+                        default=[1, 10, 100, 1000, 10_000, 100_000])
+    parser.add_argument("--per-row-max-batch", type=int, default=1000,
+                        help="largest batch timed for paths that loop over rows")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    bundle = hotel_app.get_model_bundle()
+    bundle.rf_model.n_jobs = 1
+    hotel_app.micro_batcher.start()
+    inputs = sample_inputs(max(args.batch_sizes + [args.single_rows]), args.seed, bundle)
+    print(f"Model {bundle.version} ({bundle.forest.n_trees} trees); inputs: {len(inputs['X']):,} seeded hotel.csv rows\n")
+
+    # Every probability path must agree with the pickled model
+    reference = bundle.rf_model.predict_proba(inputs["X_df"].iloc[:200])[:, 1]
+    results = []
+    for name, kind, per_row, probabilities, fn in scoring_paths(bundle):
+        slow = name.startswith("notebook")
+        n_single = min(args.single_rows, args.slow_rows) if slow else args.single_rows
+        max_batch = args.slow_rows if slow else args.per_row_max_batch if per_row else max(args.batch_sizes)
+        result = {"path": name, "per_row": per_row, "single_row": single_row_latency(fn, inputs, kind, n_single),
+                  "single_rows_timed": n_single, "rows_per_second": {}, "peak_alloc_bytes": {}}
+        if probabilities:
+            got = np.asarray(fn(take(inputs, kind, 0, min(200, max_batch))), dtype=np.float64)
+            result["max_abs_diff_vs_sklearn"] = float(np.abs(got - reference[:len(got)]).max())
+        for size in args.batch_sizes:
+            if size <= max_batch:
+                result["rows_per_second"][str(size)] = throughput(fn, inputs, kind, size)
+                result["peak_alloc_bytes"][str(size)] = peak_allocation(fn, inputs, kind, size)
+        results.append(result)
+        s = result["single_row"]
+        print(f"{name:<31} p50 {s['p50_ms']:8.3f} ms  p95 {s['p95_ms']:8.3f}  p99 {s['p99_ms']:8.3f}"
+              + (f"  max |dp| {result['max_abs_diff_vs_sklearn']:.1e}" if probabilities else ""), flush=True)
+
+    sizes = [str(size) for size in args.batch_sizes]
+    print(f"\nrows/s{'':<25}" + "".join(f"{size:>11}" for size in sizes))
+    for r in results:
+        print(f"{r['path']:<31}" + "".join(
+            f"{r['rows_per_second'][size]:>11,.0f}" if size in r["rows_per_second"] else f"{'-':>11}" for size in sizes))
+    print(f"\npeak KB/call{'':<19}" + "".join(f"{size:>11}" for size in sizes))
+    for r in results:
+        print(f"{r['path']:<31}" + "".join(
+            f"{r['peak_alloc_bytes'][size] / 1e3:>11,.0f}" if size in r["peak_alloc_bytes"] else f"{'-':>11}"
+            for size in sizes))
+
+    with open(args.output, "w") as f:
+        json.dump({"environment": dict(environment(), model_version=bundle.version, seed=args.seed),
+                   "results": results}, f, indent=2)
+    print(f"\nWrote {args.output}")
+    failed = [r["path"] for r in results if r.get("max_abs_diff_vs_sklearn", 0.0) > 1e-9]
+    if failed:
+        raise SystemExit(f"Probabilities differ from the pickled model: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# bench_training.py - how training the cancellation forest scales
+"""
+Usage:
+    python bench_training.py [-o results.json] [--rows 36275,300000,1000000]
+                             [--n-jobs 1,2,-1] [--n-estimators 50,100,200]
+                             [--max-depth 10,15,None] [--full-grid]
+                             [--baseline old_results.json]
+
+Times RandomForestClassifier.fit on train.ipynb's features over a sweep of
+n_jobs, n_estimators, max_depth and dataset size. Datasets larger than
+hotel.csv are bootstrapped from it (rows drawn with replacement, fixed
+seed). By default each axis is swept on its own around the notebook's
+configuration (all CPUs, 100 trees, depth 15, hotel.csv's size);
+--full-grid runs every combination instead.
+
+Every point runs in a fresh process, so its peak memory is its own. The
+suite records fit wall time, CPU time and utilisation (CPU seconds per
+wall second, and per available core), the process's peak RSS (and RSS
+before the fit), and the pickled model size and node count. Results go
+to a JSON file together with the library versions, CPU count and git
+commit. --baseline prints the fit-time ratio against an earlier results
+file for the points both runs share.
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from dataset_cache import CACHE_DIR, load_dataset
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# train.ipynb's configuration; the one-axis sweeps vary one of these at a time
+BASELINE_POINT = {"n_jobs": -1, "n_estimators": 100, "max_depth": 15}
+AXES = ("rows", "n_jobs", "n_estimators", "max_depth")
+
+
+def int_list(value):
+    return [None if v.strip() == "None" else int(v) for v in value.split(",")]
+
+
+def run_point(point, csv_path, cache_dir):
+    """Fit one configuration in this process and return its measurements."""
+    import psutil
+    from sklearn.ensemble import RandomForestClassifier
+
+    from model_bundle import DEFAULT_FEATURE_COLS
+    from train import peak_rss_mb
+
+    dataset = load_dataset(csv_path, cache_dir=cache_dir)
+    rows = point["rows"]
+    rng = np.random.default_rng(0)
+    if rows == dataset.n_rows:
+        idx = np.arange(rows)
+    else:
+        idx = np.sort(rng.choice(dataset.n_rows, size=rows, replace=rows > dataset.n_rows))
+    X = dataset.matrix(list(DEFAULT_FEATURE_COLS), idx)
+    y = np.asarray(dataset.label)[idx]
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss / 1e6
+    model = RandomForestClassifier(n_estimators=point["n_estimators"], max_depth=point["max_depth"],
+                                   n_jobs=point["n_jobs"], random_state=42)
+    cpu_start = process.cpu_times()
+    start = time.perf_counter()
+    model.fit(X, y)
+    wall = time.perf_counter() - start
+    cpu_end = process.cpu_times()
+    cpu = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+
+    return dict(point, **{
+        "fit_seconds": wall,
+        "cpu_seconds": cpu,
+        "cpu_utilization": cpu / wall,
+        "cpu_utilization_per_core": cpu / wall / os.cpu_count(),
+        "rss_before_fit_mb": rss_before,
+        "peak_rss_mb": peak_rss_mb(),
+        "model_bytes": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        "nodes": int(sum(tree.tree_.node_count for tree in model.estimators_)),
+    })
+
+
+def sweep(args, csv_rows):
+    """The points to run, baseline configuration first."""
+    values = {"rows": args.rows or [csv_rows, 300_000, 1_000_000], "n_jobs": args.n_jobs,
+              "n_estimators": args.n_estimators, "max_depth": args.max_depth}
+    if args.full_grid:
+        points = [{}]
+        for axis in AXES:
+            points = [dict(p, **{axis: v}) for p in points for v in values[axis]]
+        return points
+    baseline = dict(BASELINE_POINT, rows=csv_rows)
+    points = [baseline]
+    for axis in AXES:
+        for v in values[axis]:
+            point = dict(baseline, **{axis: v})
+            if point not in points:
+                points.append(point)
+    return points
+
+
+def environment():
+    import sklearn
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def point_key(point):
+    return tuple(point[axis] for axis in AXES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", default="bench_training.json", help="results file")
+    parser.add_argument("--csv", default=os.path.join(BASE_DIR, "hotel.csv"))
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="dataset cache root (default: dataset_cache/)")
+    parser.add_argument("--rows", type=int_list, help="dataset sizes (default: hotel.csv's, 300000, 1000000)")
+    parser.add_argument("--n-jobs", type=int_list, default=[1, 2, 4, -1])
+    parser.add_argument("--n-estimators", type=int_list, default=[25, 50, 100, 200])
+    parser.add_argument("--max-depth", type=int_list, default=[5, 10, 15, 20, None])
+    parser.add_argument("--full-grid", action="store_true", help="every combination instead of one axis at a time")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per point (the fastest is kept)")
+    parser.add_argument("--baseline", help="earlier results file to compare fit times against")
+    parser.add_argument("--point", help=argparse.SUPPRESS)  # internal: run one point, print JSON
+    args = parser.parse_args()
+
+    if args.point:
+        print(json.dumps(run_point(json.loads(args.point), args.csv, args.cache_dir)))
+        return
+
+    # Build the dataset cache once, before the points run
+    points = sweep(args, load_dataset(args.csv, cache_dir=args.cache_dir).n_rows)
+    print(f"{len(points)} points x {args.repeat} run(s), each in a fresh process")
+    print(f"{'rows':>10} {'n_jobs':>6} {'trees':>6} {'depth':>6} {'fit s':>8} {'CPU s':>8} {'util':>6}"
+          f" {'peak MB':>8} {'model MB':>9}")
+    results = []
+    for point in points:
+        runs = []
+        for _ in range(args.repeat):
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--csv", args.csv, "--cache-dir", args.cache_dir,
+                                  "--point", json.dumps(point)], cwd=BASE_DIR, capture_output=True, text=True)
+            if out.returncode != 0:
+                sys.exit(f"Point {point} failed:\n{out.stderr}")
+            runs.append(json.loads(out.stdout.splitlines()[-1]))
+        r = min(runs, key=lambda run: run["fit_seconds"])
+        results.append(r)
+        print(f"{r['rows']:>10,} {r['n_jobs']:>6} {r['n_estimators']:>6} {str(r['max_depth']):>6} {r['fit_seconds']:>8.2f}"
+              f" {r['cpu_seconds']:>8.2f} {r['cpu_utilization']:>6.2f} {r['peak_rss_mb']:>8.0f}"
+              f" {r['model_bytes'] / 1e6:>9.1f}", flush=True)
+
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            before = {point_key(r): r for r in json.load(f)["results"]}
+        print(f"\nFit time vs {args.baseline} (new / old):")
+        for r in results:
+            old = before.get(point_key(r))
+            if old:
+                print(f"  rows={r['rows']:,} n_jobs={r['n_jobs']} trees={r['n_estimators']} depth={r['max_depth']}: "
+                      f"{r['fit_seconds']:.2f}s / {old['fit_seconds']:.2f}s = {r['fit_seconds'] / old['fit_seconds']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
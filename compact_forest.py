@@ -0,0 +1,197 @@
+# compact_forest.py - shrink the trained forest and report what it costs
+"""
+Usage:
+    python compact_forest.py -o model_files/compact [--auc-tolerance 0.002]
+                             [--value-float32] [--no-merge] [--report report.json]
+    python model_registry.py publish model_files/compact --activate
+
+Flattens the pickled forest from --model-dir and compacts it
+(FlatForest.compact): float32 thresholds, int16 feature ids, int32 node
+indices and, unless --no-merge, collapsed leaf pairs with identical values.
+All of these route every row exactly as before. Optional lossy steps:
+
+  --auc-tolerance T  keep only the first trees needed for ROC-AUC on a
+                     selection split to stay within T of the full forest
+  --value-float32    store leaf probabilities as float32
+
+The compacted forest is written to OUTPUT/compact_forest.joblib next to a
+copy of the model files, ready to publish; the app serves it in place of
+the pickle. The report compares on-disk size, resident memory and load
+time (fresh process), single-row latency, ROC-AUC and risk-bucket agreement
+against the original. ROC-AUC is measured on half of train.ipynb's held-out
+20% split; trees are selected on the other half.
+"""
+import argparse
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from app import RISK_THRESHOLDS
+from forest_engine import FlatForest
+from model_bundle import (COMPACT_FOREST_FILENAME, ENCODERS_FILENAME, FEATURE_COLS_FILENAME,
+                          MODEL_FILENAME)
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# Loads one artifact in a fresh interpreter and prints load seconds and RSS growth in bytes
+LOAD_PROBE = """
+import pickle, sys, time
+import psutil, joblib, numpy, sklearn.ensemble
+from forest_engine import FlatForest
+process = psutil.Process()
+before = process.memory_info().rss
+start = time.perf_counter()
+if sys.argv[1] == "pickle":
+    with open(sys.argv[2], "rb") as f:
+        obj = pickle.load(f)
+else:
+    obj = FlatForest.load(sys.argv[2])
+print(time.perf_counter() - start, process.memory_info().rss - before)
+"""
+
+
+def load_holdout(csv_path, encoders, feature_cols):
+    """train.ipynb's 20% test split, halved into (selection, evaluation) parts."""
+    df = pd.read_csv(csv_path)
+    for col, le in encoders.items():
+        df[col + "_encoded"] = le.transform(df[col])
+    df["total_nights"] = df["no_of_weekend_nights"] + df["no_of_week_nights"]
+    df["total_guests"] = df["no_of_adults"] + df["no_of_children"]
+    y = (df["booking_status"] == "Canceled").astype(int)
+    _, X_test, _, y_test = train_test_split(df[feature_cols], y, test_size=0.2, random_state=42, stratify=y)
+    X_sel, X_eval, y_sel, y_eval = train_test_split(X_test, y_test, test_size=0.5, random_state=0, stratify=y_test)
+    return X_sel, y_sel.to_numpy(), X_eval, y_eval.to_numpy()
+
+
+def select_trees(forest, X, y, tolerance, min_trees):
+    """The shortest prefix of the forest whose ROC-AUC is within `tolerance` of all trees.
+
+    Bagged trees are exchangeable, so the trees past the prefix are the
+    low-value ones. (Picking individual "best" trees greedily instead
+    overfits the selection rows and loses more AUC on unseen data.)
+    """
+    P = forest.tree_probabilities(X)
+    full_auc = roc_auc_score(y, P.sum(axis=1))
+    prefix_sums = np.cumsum(P, axis=1)
+    for k in range(min_trees, forest.n_trees):
+        if roc_auc_score(y, prefix_sums[:, k - 1]) >= full_auc - tolerance:
+            return list(range(k))
+    return list(range(forest.n_trees))
+
+
+def probe_load(kind, path, runs=3):
+    """Median load time and RSS growth of loading `path` in a fresh process."""
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", LOAD_PROBE, kind, path], cwd=BASE_DIR,
+                             capture_output=True, text=True, check=True).stdout.split()
+        results.append((float(out[0]), int(out[1])))
+    return float(np.median([r[0] for r in results])), int(np.median([r[1] for r in results]))
+
+
+def single_row_latency(predict, rows):
+    timings = []
+    for i in range(len(rows)):
+        start = time.perf_counter()
+        predict(i)
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, 50) * 1000.0, np.percentile(timings, 99) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", required=True, help="directory for the compacted model")
+    parser.add_argument("--model-dir", default=os.path.join(BASE_DIR, "model_files"), help="trained model files")
+    parser.add_argument("--csv", default=os.path.join(BASE_DIR, "hotel.csv"), help="training data (for ROC-AUC)")
+    parser.add_argument("--auc-tolerance", type=float, default=0.0, help="allowed ROC-AUC loss from dropping trees")
+    parser.add_argument("--min-trees", type=int, default=10, help="never keep fewer trees than this")
+    parser.add_argument("--value-float32", action="store_true", help="store leaf probabilities as float32")
+    parser.add_argument("--no-merge", action="store_true", help="keep identical sibling leaves")
+    parser.add_argument("--latency-rows", type=int, default=300, help="rows used for single-row latency")
+    parser.add_argument("--report", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    model_path = os.path.join(args.model_dir, MODEL_FILENAME)
+    with open(model_path, "rb") as f:
+        rf_model = pickle.load(f)
+    with open(os.path.join(args.model_dir, ENCODERS_FILENAME), "rb") as f:
+        encoders = pickle.load(f)
+    with open(os.path.join(args.model_dir, FEATURE_COLS_FILENAME), "rb") as f:
+        feature_cols = pickle.load(f)
+    forest = FlatForest.from_sklearn(rf_model)
+    if not forest.EXCHANGEABLE_TREES:
+        sys.exit("Error: compaction needs a random forest model")
+    X_sel, y_sel, X_eval, y_eval = load_holdout(args.csv, encoders, feature_cols)
+
+    trees = None
+    if args.auc_tolerance > 0:
+        trees = select_trees(forest, X_sel.to_numpy(np.float64), y_sel, args.auc_tolerance, args.min_trees)
+        print(f"Keeping {len(trees)} of {forest.n_trees} trees")
+    compact = forest.compact(trees=trees, merge_leaves=not args.no_merge,
+                             value_dtype=np.float32 if args.value_float32 else np.float64)
+    print(f"Nodes: {forest.n_nodes:,} -> {compact.n_nodes:,}")
+
+    os.makedirs(args.output, exist_ok=True)
+    compact_path = os.path.join(args.output, COMPACT_FOREST_FILENAME)
+    compact.save(compact_path)
+    if os.path.abspath(args.output) != os.path.abspath(args.model_dir):
+        for name in (MODEL_FILENAME, ENCODERS_FILENAME, FEATURE_COLS_FILENAME):
+            shutil.copy2(os.path.join(args.model_dir, name), os.path.join(args.output, name))
+
+    # Report: the sklearn pickle, the plain flattened forest and the compacted one
+    X_eval_np = X_eval.to_numpy(np.float64)
+    rf_model.n_jobs = 1
+    reference = rf_model.predict_proba(X_eval)[:, 1]
+    rows_df, rows = X_eval.iloc[:args.latency_rows], X_eval_np[:args.latency_rows]
+    with tempfile.TemporaryDirectory() as tmp:
+        flat_path = os.path.join(tmp, "flat_forest.joblib")
+        forest.save(flat_path)
+        candidates = [
+            ("sklearn pickle", "pickle", model_path, reference,
+             lambda i: rf_model.predict_proba(rows_df.iloc[[i]])),
+            ("flattened", "flat", flat_path, forest.predict_proba(X_eval_np)[:, 1],
+             lambda i: forest.predict_proba(rows[i])),
+            ("compacted", "flat", compact_path, compact.predict_proba(X_eval_np)[:, 1],
+             lambda i: compact.predict_proba(rows[i])),
+        ]
+        report = []
+        for name, kind, path, probabilities, predict_one in candidates:
+            load_s, rss = probe_load(kind, path)
+            p50, p99 = single_row_latency(predict_one, rows)
+            report.append({
+                "model": name,
+                "disk_bytes": os.path.getsize(path),
+                "rss_bytes": rss,
+                "load_ms": load_s * 1000.0,
+                "single_row_p50_ms": p50,
+                "single_row_p99_ms": p99,
+                "roc_auc": roc_auc_score(y_eval, probabilities),
+                "max_abs_prob_diff": float(np.abs(probabilities - reference).max()),
+                "risk_bucket_agreement": float(np.mean(
+                    np.searchsorted(RISK_THRESHOLDS, probabilities) == np.searchsorted(RISK_THRESHOLDS, reference))),
+            })
+
+    print(f"\n{'model':<16}{'disk MB':>9}{'RSS MB':>9}{'load ms':>9}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'ROC-AUC':>9}{'max |dp|':>10}{'buckets':>9}")
+    for r in report:
+        print(f"{r['model']:<16}{r['disk_bytes'] / 1e6:>9.2f}{r['rss_bytes'] / 1e6:>9.2f}{r['load_ms']:>9.1f}"
+              f"{r['single_row_p50_ms']:>9.3f}{r['single_row_p99_ms']:>9.3f}{r['roc_auc']:>9.4f}{r['max_abs_prob_diff']:>10.2e}"
+              f"{r['risk_bucket_agreement']:>9.2%}")
+    print(f"\nWrote {compact_path}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"trees": compact.n_trees, "nodes": compact.n_nodes, "models": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
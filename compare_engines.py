@@ -0,0 +1,135 @@
+# compare_engines.py - random forest vs histogram gradient boosting on the same split
+"""
+Usage:
+    python compare_engines.py [--report report.json] [TRAIN.PY OPTIONS ...]
+
+Trains both train.py engines (--engine forest and --engine hgb) on
+train.ipynb's split, with any train.py options passed through (e.g.
+--max-iter 300 --learning-rate 0.05, or --n-estimators 200), and compares:
+
+  ROC-AUC            on the 20% test split
+  fit time           wall seconds for fit()
+  artifact size      the pickled model, and the flattened engine the app serves
+  per-row latency    p50/p99 of one-row calls, sklearn and flattened
+  batch throughput   rows/s scoring the whole test split, sklearn and flattened
+
+Nothing is written to model_files/; train the winner with train.py.
+"""
+import argparse
+import json
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+import train
+from dataset_cache import load_dataset
+from forest_engine import FlatForest
+from model_bundle import DEFAULT_FEATURE_COLS
+
+ENGINES = ("forest", "hgb")
+
+
+def latency(fn, n_rows):
+    timings = []
+    for i in range(n_rows):
+        start = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, 50) * 1000.0, np.percentile(timings, 99) * 1000.0
+
+
+def rows_per_second(fn, n_rows, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return n_rows / min(timings)
+
+
+def evaluate(engine, train_args, dataset, train_idx, test_idx, latency_rows):
+    args = argparse.Namespace(**dict(vars(train_args), engine=engine))
+    model, dtype = train.make_model(args)
+    feature_cols = list(DEFAULT_FEATURE_COLS)
+    y = np.asarray(dataset.label)
+    X_train = pd.DataFrame(dataset.matrix(feature_cols, train_idx, dtype=dtype), columns=feature_cols, copy=False)
+    X_test = pd.DataFrame(dataset.matrix(feature_cols, test_idx, dtype=dtype), columns=feature_cols, copy=False)
+
+    start = time.perf_counter()
+    model.fit(X_train, y[train_idx])
+    fit_seconds = time.perf_counter() - start
+
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = 1
+    flat = FlatForest.from_sklearn(model)
+    X_np = X_test.to_numpy(np.float64)
+    probabilities = model.predict_proba(X_test)[:, 1]
+    flat_probabilities = flat.predict_proba(X_np)[:, 1]
+    with tempfile.TemporaryDirectory() as tmp:
+        flat_path = os.path.join(tmp, "flat.joblib")
+        flat.save(flat_path)
+        flat_bytes = os.path.getsize(flat_path)
+
+    rows = X_test.iloc[:latency_rows]
+    sk_p50, sk_p99 = latency(lambda i: model.predict_proba(rows.iloc[[i]]), len(rows))
+    flat_p50, flat_p99 = latency(lambda i: flat.predict_proba(X_np[i]), len(rows))
+    return {
+        "engine": engine,
+        "model": type(model).__name__,
+        "params": {k: v for k, v in model.get_params().items() if not callable(v)},
+        "trees": flat.n_trees,
+        "nodes": flat.n_nodes,
+        "roc_auc": roc_auc_score(y[test_idx], probabilities),
+        "fit_seconds": fit_seconds,
+        "pickle_bytes": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        "flat_bytes": flat_bytes,
+        "sklearn_row_p50_ms": sk_p50,
+        "sklearn_row_p99_ms": sk_p99,
+        "flat_row_p50_ms": flat_p50,
+        "flat_row_p99_ms": flat_p99,
+        "sklearn_batch_rows_per_s": rows_per_second(lambda: model.predict_proba(X_test), len(X_test)),
+        "flat_batch_rows_per_s": rows_per_second(lambda: flat.predict_proba(X_np), len(X_np)),
+        "flat_max_abs_diff": float(np.abs(flat_probabilities - probabilities).max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--report", help="also write the comparison as JSON")
+    parser.add_argument("--latency-rows", type=int, default=300, help="rows used for per-row latency")
+    args, train_argv = parser.parse_known_args()
+    train_args = train.build_parser().parse_args(train_argv)
+
+    dataset = load_dataset(train_args.csv, train_args.db, train_args.cache_dir, train_args.chunk_size)
+    y = np.asarray(dataset.label)
+    train_idx, test_idx = train_test_split(np.arange(len(y)), test_size=train_args.test_size,
+                                           random_state=train_args.random_state, stratify=y)
+    results = []
+    for engine in ENGINES:
+        print(f"Training {engine}...", flush=True)
+        results.append(evaluate(engine, train_args, dataset, train_idx, test_idx, args.latency_rows))
+
+    metrics = [
+        ("model", "{}"), ("trees", "{:,}"), ("nodes", "{:,}"), ("roc_auc", "{:.4f}"), ("fit_seconds", "{:.2f}"),
+        ("pickle_bytes", "{:,}"), ("flat_bytes", "{:,}"),
+        ("sklearn_row_p50_ms", "{:.3f}"), ("sklearn_row_p99_ms", "{:.3f}"),
+        ("flat_row_p50_ms", "{:.3f}"), ("flat_row_p99_ms", "{:.3f}"),
+        ("sklearn_batch_rows_per_s", "{:,.0f}"), ("flat_batch_rows_per_s", "{:,.0f}"),
+        ("flat_max_abs_diff", "{:.1e}"),
+    ]
+    print(f"\n{'':<26}" + "".join(f"{r['engine']:>32}" for r in results))
+    for name, fmt in metrics:
+        print(f"{name:<26}" + "".join(f"{fmt.format(r[name]):>32}" for r in results))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# dataset_cache.py - columnar, memory-mapped cache of the training data
+"""
+Usage:
+    python dataset_cache.py [--csv hotel.csv] [--db hotel_booking.db] [--cache-dir dataset_cache]
+
+Converts hotel.csv (plus, with --db, every booking whose outcome is final,
+mapped back to hotel.csv categories) into one .npy file per column:
+
+    dataset_cache/<key>/
+        no_of_adults.npy ... avg_price_per_room.npy     compact dtypes
+        type_of_meal_plan_encoded.npy ...               LabelEncoder codes
+        total_nights.npy  total_guests.npy              derived
+        label.npy                                       1 = Canceled
+        meta.json                                       rows, classes, sources
+
+<key> is a hash of the CSV bytes, the exported bookings and the cache
+format, so any change to the sources builds a new entry (older entries for
+the same sources are removed). load_dataset() memory-maps the columns, so
+a cache hit costs a hash of the source plus a few file opens. Building
+streams the CSV in chunks, so memory stays bounded for large histories.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "dataset_cache")
+# Bump when the layout or the encoding changes, so old entries are not reused
+CACHE_FORMAT = 1
+
+# hotel.csv columns and the smallest dtypes that hold them
+NUMERIC_DTYPES = {
+    "no_of_adults": np.int8,
+    "no_of_children": np.int8,
+    "no_of_weekend_nights": np.int8,
+    "no_of_week_nights": np.int8,
+    "required_car_parking_space": np.int8,
+    "lead_time": np.int16,
+    "arrival_year": np.int16,
+    "arrival_month": np.int8,
+    "arrival_date": np.int8,
+    "repeated_guest": np.int8,
+    "no_of_previous_cancellations": np.int16,
+    "no_of_previous_bookings_not_canceled": np.int16,
+    "avg_price_per_room": np.float32,
+    "no_of_special_requests": np.int8,
+}
+CATEGORICAL_COLUMNS = ["type_of_meal_plan", "room_type_reserved", "market_segment_type"]
+DERIVED_COLUMNS = {
+    "total_nights": ("no_of_weekend_nights", "no_of_week_nights"),
+    "total_guests": ("no_of_adults", "no_of_children"),
+}
+LABEL_COLUMN = "booking_status"
+CANCELED = "Canceled"
+
+
+class Dataset:
+    """Memory-mapped columns of one cache entry."""
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.key = meta["key"]
+        self.n_rows = meta["n_rows"]
+        self.classes = meta["classes"]
+        self.columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in meta["columns"]
+        }
+
+    @property
+    def label(self):
+        return self.columns["label"]
+
+    def encoders(self):
+        """Fitted LabelEncoders for the categorical columns, as train.ipynb saved them."""
+        from sklearn.preprocessing import LabelEncoder
+        encoders = {}
+        for col, classes in self.classes.items():
+            le = LabelEncoder()
+            le.classes_ = np.array(classes, dtype=object)
+            encoders[col] = le
+        return encoders
+
+    def matrix(self, feature_cols, rows=None, dtype=np.float32):
+        """(rows, features) matrix; only the requested rows are read."""
+        n = self.n_rows if rows is None else len(rows)
+        out = np.empty((n, len(feature_cols)), dtype=dtype)
+        for j, name in enumerate(feature_cols):
+            column = self.columns[name]
+            out[:, j] = column if rows is None else column[rows]
+        return out
+
+
+def export_bookings(db_path, where=None, params=()):
+    """hotel.csv records for the bookings whose outcome is final (and match `where`, if given)."""
+    import app as hotel_app
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(bookings)")}
+        if "checkout_date" not in columns:
+            hotel_app.init_db(db_path)  # FINAL_OUTCOME_SQL reads the stay columns the app adds
+        sql = hotel_app.FINAL_OUTCOME_SQL + (f" AND ({where})" if where else "") + " ORDER BY b.booking_id"
+        return [hotel_app.training_record(b) for b in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+
+def source_key(csv_path, booking_records):
+    digest = hashlib.blake2b(f"format={CACHE_FORMAT}".encode(), digest_size=16)
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(json.dumps(booking_records, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _iter_chunks(csv_path, booking_records, chunk_size):
+    dtypes = dict(NUMERIC_DTYPES, **{col: "category" for col in CATEGORICAL_COLUMNS}, **{LABEL_COLUMN: "category"})
+    yield from pd.read_csv(csv_path, usecols=list(dtypes), dtype=dtypes, chunksize=chunk_size)
+    if booking_records:
+        yield pd.DataFrame.from_records(booking_records, columns=list(dtypes)).astype(dtypes)
+
+
+def _count_rows(csv_path, chunk_size):
+    return sum(len(chunk) for chunk in pd.read_csv(csv_path, usecols=[LABEL_COLUMN], chunksize=chunk_size))
+
+
+def build(csv_path, path, key, booking_records=(), chunk_size=100_000, db_path=None):
+    """Stream the sources into one .npy file per column under `path`; returns meta."""
+    n_rows = _count_rows(csv_path, chunk_size) + len(booking_records)
+    os.makedirs(path)
+    columns = {}
+
+    def open_column(name, dtype):
+        columns[name] = np.lib.format.open_memmap(os.path.join(path, f"{name}.npy"), mode="w+",
+                                                  dtype=dtype, shape=(n_rows,))
+
+    for name, dtype in NUMERIC_DTYPES.items():
+        open_column(name, dtype)
+    for name in DERIVED_COLUMNS:
+        open_column(name, np.int16)
+    # Provisional codes (order of first appearance) until all categories are known
+    for col in CATEGORICAL_COLUMNS:
+        open_column(col + "_encoded", np.int16)
+    open_column("label", np.int8)
+
+    provisional = {col: {} for col in CATEGORICAL_COLUMNS}
+    offset = 0
+    for chunk in _iter_chunks(csv_path, booking_records, chunk_size):
+        rows = slice(offset, offset + len(chunk))
+        offset += len(chunk)
+        for name in NUMERIC_DTYPES:
+            columns[name][rows] = chunk[name].to_numpy()
+        for name, (a, b) in DERIVED_COLUMNS.items():
+            columns[name][rows] = chunk[a].to_numpy(np.int16) + chunk[b].to_numpy(np.int16)
+        for col in CATEGORICAL_COLUMNS:
+            codes = provisional[col]
+            lookup = np.array([codes.setdefault(c, len(codes)) for c in chunk[col].cat.categories], dtype=np.int16)
+            columns[col + "_encoded"][rows] = lookup[chunk[col].cat.codes.to_numpy()]
+        columns["label"][rows] = (chunk[LABEL_COLUMN] == CANCELED).to_numpy(np.int8)
+    if offset != n_rows:
+        raise ValueError(f"{csv_path} changed while it was being cached")
+
+    # Provisional codes -> LabelEncoder codes (position in the sorted classes)
+    classes = {}
+    for col in CATEGORICAL_COLUMNS:
+        classes[col] = sorted(provisional[col])
+        remap = np.empty(len(classes[col]), dtype=np.int16)
+        for category, code in provisional[col].items():
+            remap[code] = classes[col].index(category)
+        encoded = columns[col + "_encoded"]
+        encoded[:] = remap[encoded]
+    for column in columns.values():
+        column.flush()
+
+    meta = {
+        "key": key,
+        "format": CACHE_FORMAT,
+        "n_rows": n_rows,
+        "columns": list(columns),
+        "classes": classes,
+        "csv_path": os.path.abspath(csv_path),
+        "db_path": os.path.abspath(db_path) if db_path else None,
+        "n_bookings": len(booking_records),
+    }
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def load_dataset(csv_path, db_path=None, cache_dir=CACHE_DIR, chunk_size=100_000):
+    """The cached Dataset for hotel.csv (+ final bookings from `db_path`), built if needed."""
+    booking_records = export_bookings(db_path) if db_path else []
+    key = source_key(csv_path, booking_records)
+    path = os.path.join(cache_dir, key)
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        # Build under a scratch name; the entry appears complete or not at all
+        tmp_path = os.path.join(cache_dir, f".{key}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        try:
+            build(csv_path, tmp_path, key, booking_records, chunk_size, db_path)
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(tmp_path, path)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        _prune(cache_dir, key)
+    with open(meta_path) as f:
+        return Dataset(path, json.load(f))
+
+
+def _prune(cache_dir, keep):
+    """Remove older entries built from the same sources as `keep`."""
+    def sources(name):
+        with open(os.path.join(cache_dir, name, "meta.json")) as f:
+            meta = json.load(f)
+        return meta.get("csv_path"), meta.get("db_path")
+
+    current = sources(keep)
+    for name in os.listdir(cache_dir):
+        if name != keep and os.path.exists(os.path.join(cache_dir, name, "meta.json")) and sources(name) == current:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=os.path.join(BASE_DIR, "hotel.csv"), help="hotel.csv-format source")
+    parser.add_argument("--db", help="also include final-outcome bookings from this database")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="cache root (default: dataset_cache/)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="CSV rows per chunk (default: 100000)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dataset = load_dataset(args.csv, args.db, args.cache_dir, args.chunk_size)
+    print(f"{dataset.n_rows:,} rows, {len(dataset.columns)} columns in {dataset.path} "
+          f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
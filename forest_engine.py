@@ -0,0 +1,519 @@
+# forest_engine.py - flattened random forest inference (NumPy only)
+"""
+Compiled representation of a fitted sklearn forest classifier (FlatForest)
+or binary HistGradientBoostingClassifier (BoostedTrees).
+
+All trees are flattened into contiguous node arrays (feature, threshold,
+children, value) with global child indices, so a whole batch of rows is
+routed through every tree at once with a handful of NumPy gathers per depth
+level. No sklearn input validation or joblib dispatch happens at predict time.
+
+Probabilities are bit-identical to ``predict_proba`` of the source model run
+with ``n_jobs=1``: leaf values are normalised exactly like
+``DecisionTreeClassifier.predict_proba`` and summed in tree order before the
+final division by the number of trees. (With ``n_jobs>1`` sklearn adds the
+per-tree results in thread completion order, so it can itself differ in the
+last bit between calls.)
+
+``contributions`` splits each row's score into a bias plus one
+contribution per feature by crediting every split on the row's path with
+the change in node value it causes (tree-path decomposition), again for
+all trees at once.
+
+``predict_bucket`` is an "anytime" variant for callers that only need to know
+which side of a few probability thresholds a row falls on: trees are
+evaluated block by block and a row stops as soon as the remaining trees can
+no longer move it into another bucket.
+
+BoostedTrees stores the boosting iterations in the same node arrays; it
+sums raw leaf scores onto the baseline instead of averaging probabilities,
+so its probabilities are bit-identical to the source model's as well.
+FlatForest.from_sklearn() and FlatForest.load() return whichever class
+fits the model or file.
+"""
+import math
+
+import numpy as np
+
+# Rows routed through the forest per chunk; bounds the (rows, trees) work arrays
+CHUNK_ROWS = 4096
+
+
+# Arrays persisted by FlatForest.save(); everything else is derived or scalar
+_SAVED_ARRAYS = ("feature", "threshold", "missing_left", "value", "roots", "classes_", "_children")
+
+
+class FlatForest:
+    KIND = "forest"                   # stored by save() so load() picks the class
+    INPUT_DTYPE = np.float32          # what the source model converts X to before traversal
+    EXCHANGEABLE_TREES = True         # bagged trees: predict_bucket's Hoeffding bound applies
+    CONTRIBUTION_UNITS = "probability"  # what contributions() adds up to
+
+    def __init__(self, feature, threshold, children, missing_left, value, roots,
+                 max_depth, n_features, classes):
+        self.feature = feature            # int32 (int16 when compacted), 0 for leaves
+        self.threshold = threshold        # float64 (float32 when compacted)
+        # Interleaved [left, right] pairs so one gather picks the next node; leaves point at themselves
+        self._children = children         # intp (int32 when compacted), shape (2 * n_nodes,)
+        self.missing_left = missing_left  # bool, NaN goes left at this node
+        self.value = value                # float64 (n_nodes, n_classes), normalised per node
+        self.roots = roots                # root node of every tree, same dtype as _children
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.classes_ = classes
+        self._remaining_bounds = {}       # class index -> per-tree suffix sums, for predict_bucket
+
+    @property
+    def left(self):
+        return self._children[0::2]
+
+    @property
+    def right(self):
+        return self._children[1::2]
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted RandomForestClassifier / ExtraTreesClassifier
+        (or, as a BoostedTrees, a HistGradientBoostingClassifier)."""
+        if hasattr(model, "_predictors"):
+            return BoostedTrees.from_sklearn(model)
+        features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for est in model.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            own = np.arange(offset, offset + n, dtype=np.intp)
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(np.where(is_leaf, own, tree.children_left + offset).astype(np.intp))
+            rights.append(np.where(is_leaf, own, tree.children_right + offset).astype(np.intp))
+            mgl = getattr(tree, "missing_go_to_left", None)
+            missing.append(np.zeros(n, dtype=bool) if mgl is None else np.asarray(mgl, dtype=bool))
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            proba = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba /= normalizer
+            values.append(proba)
+
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features)),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds)),
+            children=np.column_stack((np.concatenate(lefts), np.concatenate(rights))).ravel(),
+            missing_left=np.ascontiguousarray(np.concatenate(missing)),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+            classes=np.asarray(model.classes_),
+        )
+
+    def save(self, path):
+        """Write the node arrays uncompressed so `load(path, mmap_mode="r")` can memory-map them."""
+        import joblib
+        state = {name: getattr(self, name) for name in _SAVED_ARRAYS}
+        state["kind"] = self.KIND
+        state["max_depth"] = self.max_depth
+        state["n_features"] = self.n_features
+        state.update(self._extra_state())
+        joblib.dump(state, path)
+
+    def _extra_state(self):
+        return {}
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """Load a saved forest; with mmap_mode="r" the node arrays stay in the OS page
+        cache and are shared by every process that maps the same file."""
+        import joblib
+        state = joblib.load(path, mmap_mode=mmap_mode)
+        if state.get("kind", "forest") == BoostedTrees.KIND:
+            return BoostedTrees(baseline=state["baseline"], **cls._state_args(state))
+        return FlatForest(**cls._state_args(state))
+
+    @staticmethod
+    def _state_args(state):
+        return dict(
+            feature=state["feature"],
+            threshold=state["threshold"],
+            children=state["_children"],
+            missing_left=state["missing_left"],
+            value=state["value"],
+            roots=state["roots"],
+            max_depth=state["max_depth"],
+            n_features=state["n_features"],
+            classes=state["classes_"],
+        )
+
+    def _prepare(self, X):
+        # sklearn's forests validate to float32 before traversal; thresholds are float64
+        X = np.asarray(X, dtype=self.INPUT_DTYPE)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, but the forest expects {self.n_features}")
+        return X
+
+    def apply(self, X):
+        """Leaf node index (global) reached by every row in every tree, shape (n_rows, n_trees)."""
+        X = self._prepare(X)
+        return self._apply(X)
+
+    def _apply(self, X, roots=None):
+        roots = self.roots if roots is None else roots
+        n_rows = X.shape[0]
+        flat_X = X.ravel()
+        row_base = (np.arange(n_rows, dtype=np.intp) * X.shape[1])[:, np.newaxis]
+        nodes = np.broadcast_to(roots, (n_rows, len(roots))).copy()
+        has_nan = bool(np.isnan(X).any())
+        for _ in range(self.max_depth):
+            _, nodes = self._step(flat_X, row_base, nodes, has_nan)
+        return nodes
+
+    def _step(self, flat_X, row_base, nodes, has_nan):
+        """One depth level: the split feature at `nodes` and the child each row moves to."""
+        feature = np.take(self.feature, nodes)
+        x = np.take(flat_X, row_base + feature)
+        go_left = x <= np.take(self.threshold, nodes)
+        if has_nan:
+            go_left = np.where(np.isnan(x), np.take(self.missing_left, nodes), go_left)
+        return feature, np.take(self._children, 2 * nodes + ~go_left)
+
+    def predict_proba(self, X):
+        """Class probabilities, shape (n_rows, n_classes)."""
+        X = self._prepare(X)
+        out = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            chunk = X[start:start + CHUNK_ROWS]
+            leaf_values = self.value[self._apply(chunk)]  # (rows, trees, classes)
+            # cumsum adds strictly in tree order, like sklearn's accumulation loop
+            out[start:start + CHUNK_ROWS] = np.cumsum(leaf_values, axis=1, dtype=np.float64)[:, -1]
+        out /= self.n_trees
+        return out
+
+    def contributions(self, X, class_index=1):
+        """Per-feature contributions to each row's `class_index` score (tree-path decomposition).
+
+        Every split a row passes through moves its score from the node's
+        value to the child's; that change is credited to the split feature.
+        Returns (bias, contributions) of shapes (n_rows,) and (n_rows,
+        n_features): bias is the same for every row (the average root value)
+        and bias + contributions.sum(axis=1) equals the row's probability up
+        to rounding. For BoostedTrees both are in log-odds instead
+        (CONTRIBUTION_UNITS).
+        """
+        X = self._prepare(X)
+        values = self.value[:, self._value_column(class_index)]
+        n_rows, n_features = X.shape
+        out = np.empty((n_rows, n_features), dtype=np.float64)
+        for start in range(0, n_rows, CHUNK_ROWS):
+            chunk = X[start:start + CHUNK_ROWS]
+            n = len(chunk)
+            row_base = (np.arange(n, dtype=np.intp) * n_features)[:, np.newaxis]
+            nodes = np.broadcast_to(self.roots, (n, self.n_trees)).copy()
+            has_nan = bool(np.isnan(chunk).any())
+            totals = np.zeros(n * n_features, dtype=np.float64)
+            for _ in range(self.max_depth):
+                feature, children = self._step(chunk.ravel(), row_base, nodes, has_nan)
+                # Leaves point at themselves, so finished rows add 0
+                totals += np.bincount((row_base + feature).ravel(), weights=(values[children] - values[nodes]).ravel(),
+                                      minlength=n * n_features)
+                nodes = children
+            out[start:start + n] = totals.reshape(n, n_features)
+        scale = self._contribution_scale()
+        bias = self._initial_sum() + scale * values[self.roots].sum()
+        return np.full(n_rows, bias), out * scale
+
+    def _contribution_scale(self):
+        return 1.0 / self.n_trees
+
+    def _leaf_value_bounds(self, column):
+        """Smallest and largest leaf value in `column` of every tree."""
+        is_leaf = self.left == np.arange(self.n_nodes)
+        tree_of_node = np.searchsorted(self.roots, np.arange(self.n_nodes), side="right") - 1
+        leaf_values = self.value[is_leaf, column]
+        leaf_trees = tree_of_node[is_leaf]
+        lo = np.full(self.n_trees, np.inf)
+        hi = np.full(self.n_trees, -np.inf)
+        np.minimum.at(lo, leaf_trees, leaf_values)
+        np.maximum.at(hi, leaf_trees, leaf_values)
+        return lo, hi
+
+    # predict_bucket hooks: the value column holding `class_index`, the sum the
+    # trees are added onto, and the probability of a finished sum
+    def _value_column(self, class_index):
+        return class_index
+
+    def _initial_sum(self):
+        return 0.0
+
+    def _sum_to_probability(self, total):
+        return total / self.n_trees
+
+    def predict_bucket(self, X, thresholds, class_index=1, block_trees=10, delta=None):
+        """Bucket of each row's `class_index` probability, evaluating as few trees as possible.
+
+        The bucket is the number of `thresholds` the probability is strictly
+        greater than, i.e. the same as ``np.sum(p[:, None] > thresholds, axis=1)``
+        on ``predict_proba``. Trees are evaluated `block_trees` at a time in
+        forest order; after each block a row stops once the smallest and the
+        largest leaf values its remaining trees could contribute both leave
+        it in the same bucket. That rule is exact: buckets always equal the
+        full evaluation. Every block costs a full pass over the tree depth,
+        so this pays off on batches, not on single rows.
+
+        With `delta` set, a row also stops when a Hoeffding bound says the
+        remaining trees move it across a threshold with probability below
+        `delta` (per check). This stops earlier but may, rarely, disagree.
+        It assumes exchangeable (bagged) trees and is ignored for BoostedTrees.
+
+        Returns (buckets, trees_evaluated), both of shape (n_rows,).
+        """
+        X = self._prepare(X)
+        thresholds = np.sort(np.asarray(thresholds, dtype=np.float64))
+        n_rows, n_trees = X.shape[0], self.n_trees
+        column = self._value_column(class_index)
+        if column not in self._remaining_bounds:
+            lo, hi = self._leaf_value_bounds(column)
+            # Sum of the extreme contributions of trees k..end, for every k
+            self._remaining_bounds[column] = (
+                np.concatenate((np.cumsum(lo[::-1])[::-1], [0.0])),
+                np.concatenate((np.cumsum(hi[::-1])[::-1], [0.0])),
+            )
+        remaining_min, remaining_max = self._remaining_bounds[column]
+
+        # Margin for the rounding difference between these bounds and the sequential sum
+        eps = 1e-9
+        totals = np.full(n_rows, self._initial_sum(), dtype=np.float64)
+        buckets = np.zeros(n_rows, dtype=np.intp)
+        trees_evaluated = np.full(n_rows, n_trees, dtype=np.intp)
+        active = np.arange(n_rows)
+        for start in range(0, n_trees, block_trees):
+            stop = min(start + block_trees, n_trees)
+            leaf_values = self.value[self._apply(X[active], self.roots[start:stop]), column]
+            # Add tree by tree so rows that run to the end match predict_proba exactly
+            running = totals[active]
+            for t in range(stop - start):
+                running = running + leaf_values[:, t]
+            totals[active] = running
+            if stop == n_trees:
+                buckets[active] = np.sum(self._sum_to_probability(running)[:, np.newaxis] > thresholds, axis=1)
+                break
+
+            lo = self._sum_to_probability(running + remaining_min[stop]) - eps
+            hi = self._sum_to_probability(running + remaining_max[stop]) + eps
+            if delta is not None and self.EXCHANGEABLE_TREES:
+                # Remaining trees are i.i.d. draws of the same bagged tree: their mean is
+                # within `spread` of the running mean with probability >= 1 - delta
+                remaining = n_trees - stop
+                spread = math.sqrt(math.log(2.0 / delta) / 2.0) * (stop ** -0.5 + remaining ** -0.5)
+                mean = running / stop
+                lo = np.maximum(lo, (running + remaining * (mean - spread)) / n_trees)
+                hi = np.minimum(hi, (running + remaining * (mean + spread)) / n_trees)
+            lo_bucket = np.sum(lo[:, np.newaxis] > thresholds, axis=1)
+            done = lo_bucket == np.sum(hi[:, np.newaxis] > thresholds, axis=1)
+            buckets[active[done]] = lo_bucket[done]
+            trees_evaluated[active[done]] = stop
+            active = active[~done]
+            if len(active) == 0:
+                break
+        return buckets, trees_evaluated
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def tree_probabilities(self, X, class_index=1):
+        """Every tree's `class_index` probability for every row, shape (n_rows, n_trees)."""
+        X = self._prepare(X)
+        out = np.empty((X.shape[0], self.n_trees), dtype=np.float64)
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            out[start:start + CHUNK_ROWS] = self.value[self._apply(X[start:start + CHUNK_ROWS]), class_index]
+        return out
+
+    def compact(self, trees=None, merge_leaves=True, value_dtype=np.float64):
+        """A smaller copy of the forest that routes every row exactly like this one.
+
+        - trees: indices of the trees to keep (default: all), in forest order
+        - merge_leaves: collapse splits whose two children are leaves with
+          identical values (repeatedly, bottom-up)
+        - thresholds are stored as float32, rounded down: inputs are float32,
+          so `x <= t` and `x <= float32_round_down(t)` agree for every x
+        - feature ids become int16 and node indices int32 where they fit
+
+        Probabilities are unchanged except for dropped trees and, with
+        value_dtype=np.float32, the rounding of leaf values.
+        """
+        trees = np.arange(self.n_trees) if trees is None else np.sort(np.asarray(trees))
+        ends = np.append(self.roots[1:], self.n_nodes)
+        keep = np.zeros(self.n_nodes, dtype=bool)
+        for t in trees:
+            keep[self.roots[t]:ends[t]] = True
+
+        own = np.arange(self.n_nodes)
+        left = np.array(self.left, dtype=np.intp)
+        right = np.array(self.right, dtype=np.intp)
+        value = np.array(self.value)
+        while merge_leaves:
+            is_leaf = left == own
+            mergeable = (~is_leaf & is_leaf[left] & is_leaf[right] & keep
+                         & np.all(value[left] == value[right], axis=1))
+            if not mergeable.any():
+                break
+            value[mergeable] = value[left[mergeable]]
+            left[mergeable] = right[mergeable] = own[mergeable]
+
+        # Drop nodes no longer reachable from a kept root, then renumber
+        reachable = np.zeros(self.n_nodes, dtype=bool)
+        frontier = self.roots[trees].astype(np.intp)
+        while len(frontier):
+            reachable[frontier] = True
+            frontier = np.concatenate((left[frontier], right[frontier]))
+            frontier = np.unique(frontier[~reachable[frontier]])
+        new_index = np.cumsum(reachable) - 1
+
+        index_dtype = np.int32 if 2 * reachable.sum() < np.iinfo(np.int32).max else np.intp
+        feature_dtype = np.int16 if self.n_features <= np.iinfo(np.int16).max else np.int32
+        threshold = self.threshold[reachable]
+        threshold32 = threshold.astype(np.float32)
+        rounded_up = threshold32 > threshold
+        threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+        children = np.column_stack((new_index[left[reachable]], new_index[right[reachable]])).ravel()
+        return FlatForest(
+            feature=np.ascontiguousarray(self.feature[reachable], dtype=feature_dtype),
+            threshold=np.ascontiguousarray(threshold32),
+            children=np.ascontiguousarray(children, dtype=index_dtype),
+            missing_left=np.ascontiguousarray(self.missing_left[reachable]),
+            value=np.ascontiguousarray(value[reachable], dtype=value_dtype),
+            roots=new_index[self.roots[trees]].astype(index_dtype),
+            max_depth=self.max_depth,
+            n_features=self.n_features,
+            classes=self.classes_,
+        )
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in _SAVED_ARRAYS)
+
+
+class BoostedTrees(FlatForest):
+    """A binary HistGradientBoostingClassifier in FlatForest's node layout.
+
+    `value` holds each leaf's raw score (one column, learning rate already
+    applied); a row's probability is expit(baseline + sum of its leaves),
+    added in iteration order as sklearn does.
+
+    Boosted trees are not exchangeable: tree_probabilities() and compact()
+    raise TypeError, and predict_bucket() ignores delta. Callers check
+    EXCHANGEABLE_TREES (or KIND) before relying on them.
+    """
+    KIND = "boosted"
+    INPUT_DTYPE = np.float64          # HistGradientBoosting predicts on float64 input
+    EXCHANGEABLE_TREES = False
+    CONTRIBUTION_UNITS = "log-odds"
+
+    def __init__(self, feature, threshold, children, missing_left, value, roots,
+                 max_depth, n_features, classes, baseline):
+        super().__init__(feature, threshold, children, missing_left, value, roots,
+                         max_depth, n_features, classes)
+        self.baseline = float(baseline)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted binary HistGradientBoostingClassifier without categorical splits."""
+        if model.n_trees_per_iteration_ != 1:
+            raise ValueError("only binary HistGradientBoostingClassifier models can be flattened")
+        features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for (predictor,) in model._predictors:
+            nodes = predictor.nodes
+            if nodes["is_categorical"].any():
+                raise ValueError("categorical splits are not supported")
+            n = len(nodes)
+            is_leaf = nodes["is_leaf"].astype(bool)
+            own = np.arange(offset, offset + n, dtype=np.intp)
+
+            features.append(np.where(is_leaf, 0, nodes["feature_idx"]).astype(np.int32))
+            thresholds.append(nodes["num_threshold"].astype(np.float64))
+            lefts.append(np.where(is_leaf, own, nodes["left"].astype(np.intp) + offset))
+            rights.append(np.where(is_leaf, own, nodes["right"].astype(np.intp) + offset))
+            missing.append(nodes["missing_go_to_left"].astype(bool))
+            # sklearn applies the learning rate to leaves only; scale split nodes to match
+            # so contributions() sees consistent values along each path
+            values.append(np.where(is_leaf, nodes["value"], nodes["value"] * model.learning_rate)[:, np.newaxis])
+
+            roots.append(offset)
+            max_depth = max(max_depth, int(nodes["depth"].max()))
+            offset += n
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features)),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds)),
+            children=np.column_stack((np.concatenate(lefts), np.concatenate(rights))).ravel(),
+            missing_left=np.ascontiguousarray(np.concatenate(missing)),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+            classes=np.asarray(model.classes_),
+            baseline=model._baseline_prediction.ravel()[0],
+        )
+
+    def _extra_state(self):
+        return {"baseline": self.baseline}
+
+    def raw_scores(self, X):
+        """baseline + the sum of every tree's leaf score, shape (n_rows,)."""
+        X = self._prepare(X)
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            chunk = X[start:start + CHUNK_ROWS]
+            leaf_values = self.value[self._apply(chunk), 0]  # (rows, trees)
+            scores = np.column_stack((np.full(len(chunk), self.baseline), leaf_values))
+            out[start:start + CHUNK_ROWS] = np.cumsum(scores, axis=1)[:, -1]
+        return out
+
+    def predict_proba(self, X):
+        p = self._expit(self.raw_scores(X))
+        return np.column_stack((1.0 - p, p))
+
+    @staticmethod
+    def _expit(raw):
+        from scipy.special import expit  # the link sklearn's binomial loss uses
+        return expit(raw)
+
+    def _value_column(self, class_index):
+        if class_index != 1:
+            raise ValueError("BoostedTrees.predict_bucket only supports class_index=1")
+        return 0
+
+    def _initial_sum(self):
+        return self.baseline
+
+    def _sum_to_probability(self, total):
+        return self._expit(total)
+
+    def _contribution_scale(self):
+        return 1.0
+
+    def tree_probabilities(self, X, class_index=1):
+        raise TypeError("boosted trees have no per-tree probabilities; they need a random forest")
+
+    def compact(self, trees=None, merge_leaves=True, value_dtype=np.float64):
+        raise TypeError("compaction needs a random forest")
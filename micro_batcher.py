@@ -0,0 +1,127 @@
+# micro_batcher.py - coalesce concurrent small scoring calls into one model call
+"""
+Requests that score one booking at a time pay the fixed per-call cost of the
+model for a single row. MicroBatcher puts such calls on a queue; one
+dispatcher thread takes whatever arrives within `max_wait_ms` of the first
+item (up to `max_batch` rows), scores it with a single call and hands every
+caller its own slice of the result.
+
+Rows are only batched with rows for the same model bundle, so a model swap
+never mixes versions inside one call.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    def __init__(self, predict, max_batch=256, max_wait_ms=2.0, max_queue=1024):
+        """
+        predict: callable(bundle, X) -> 1-D array of probabilities for the rows of X.
+        When the queue is full, predict() scores the caller's rows directly
+        instead of blocking.
+        """
+        self.predict_batch = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=1024)
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.max_batch_rows = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    def predict(self, bundle, X):
+        """Probabilities for the rows of X, scored together with other callers' rows."""
+        if self._thread is None:
+            self.start()
+        future = Future()
+        try:
+            self.queue.put_nowait((bundle, X, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return self.predict_batch(bundle, X)
+        return future.result()
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                "requests": self.requests,
+                "rows": self.rows,
+                "batches": self.batches,
+                "avg_batch_rows": round(self.rows / self.batches, 2) if self.batches else 0.0,
+                "max_batch_rows": self.max_batch_rows,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
+        stats["queue_depth"] = self.queue.qsize()
+        stats["queue_capacity"] = self.queue.maxsize
+        stats["max_batch"] = self.max_batch
+        stats["max_wait_ms"] = self.max_wait * 1000.0
+        # Time from submit to dispatch over the last 1024 requests
+        for name, q in (("wait_p50_ms", 0.50), ("wait_p95_ms", 0.95), ("wait_p99_ms", 0.99)):
+            stats[name] = round(waits[int(q * (len(waits) - 1))] * 1000.0, 3) if waits else None
+        return stats
+
+    def _collect(self):
+        """Block for one item, then take more until the batch is full or max_wait has passed."""
+        items = [self.queue.get()]
+        n_rows = len(items[0][1])
+        deadline = time.perf_counter() + self.max_wait
+        while n_rows < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            items.append(item)
+            n_rows += len(item[1])
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            dispatched = time.perf_counter()
+            groups = {}
+            for item in items:
+                groups.setdefault(id(item[0]), []).append(item)
+            for group in groups.values():
+                self._score(group[0][0], group)
+            with self._lock:
+                self.requests += len(items)
+                self._waits.extend(dispatched - item[3] for item in items)
+
+    def _score(self, bundle, items):
+        try:
+            X = np.concatenate([item[1] for item in items])
+            probabilities = self.predict_batch(bundle, X)
+        except Exception as e:
+            with self._lock:
+                self.failed += len(items)
+            for item in items:
+                item[2].set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.rows += len(X)
+            self.max_batch_rows = max(self.max_batch_rows, len(X))
+        start = 0
+        for _, rows, future, _ in items:
+            future.set_result(probabilities[start:start + len(rows)])
+            start += len(rows)
@@ -0,0 +1,180 @@
+# model_bundle.py - the model artifacts scoring needs, loaded together
+"""
+A ModelBundle groups the flattened forest, the LabelEncoders and the feature
+column order that belong to one trained model, plus the content hash used as
+its version id. Bundles are built by load_model_bundle() and never mutated
+after publication except for the DB-derived encoding tables, which app.py
+replaces wholesale.
+
+The sklearn model itself is only unpickled when something asks for
+`bundle.rf_model`; the request path scores with `bundle.forest`, and
+app.py hands large batches to the sklearn model, which is faster there. With
+mmap=True the forest's node arrays are read from a joblib cache next to the
+model (written on first load) and memory-mapped, and the encoders are
+restored from their cached classes_, so neither sklearn nor the 100-tree
+pickle is loaded at startup and forked workers share the forest pages.
+
+A model directory may also hold a compacted forest (compact_forest.py),
+which is then served instead of the flattened pickle (bundle.compacted),
+for batches of every size.
+
+The model file may hold a RandomForestClassifier or, from train.py
+--engine hgb, a HistGradientBoostingClassifier; FlatForest.from_sklearn()
+flattens either (the latter as a BoostedTrees), so scoring code does not
+care which.
+"""
+import hashlib
+import os
+import pickle
+import threading
+
+import numpy as np
+
+from forest_engine import FlatForest
+
+MODEL_FILENAME = "random_forest_model.pkl"
+ENCODERS_FILENAME = "encoders.pkl"
+FEATURE_COLS_FILENAME = "feature_cols.pkl"
+COMPACT_FOREST_FILENAME = "compact_forest.joblib"
+
+DEFAULT_FEATURE_COLS = [
+    'no_of_adults', 'no_of_children', 'no_of_weekend_nights', 'no_of_week_nights',
+    'required_car_parking_space', 'lead_time', 'arrival_year', 'arrival_month', 'arrival_date',
+    'repeated_guest', 'no_of_previous_cancellations', 'no_of_previous_bookings_not_canceled',
+    'avg_price_per_room', 'no_of_special_requests', 'type_of_meal_plan_encoded',
+    'room_type_reserved_encoded', 'market_segment_type_encoded', 'total_nights', 'total_guests'
+]
+
+
+def files_digest(*paths):
+    """Short sha256 over the given files, so any retrained artifact changes the id."""
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class LabelClasses:
+    """The part of a fitted LabelEncoder that scoring uses, without importing sklearn."""
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+
+    def transform(self, values):
+        values = np.asarray(values)
+        codes = np.searchsorted(self.classes_, values)
+        if len(self.classes_) == 0 or np.any(codes >= len(self.classes_)) or \
+                np.any(self.classes_[np.minimum(codes, len(self.classes_) - 1)] != values):
+            raise ValueError("y contains previously unseen labels")
+        return codes
+
+
+class ModelBundle:
+    def __init__(self, model_path, forest, encoders, feature_cols, version, rf_model=None, compacted=False):
+        self.model_path = model_path
+        self.forest = forest              # FlatForest / BoostedTrees, or None when no model is available
+        self.encoders = encoders
+        self.feature_cols = feature_cols
+        self.version = version            # stored next to every cached prediction
+        self.compacted = compacted        # forest is compact_forest.joblib, not the pickle flattened
+        # DB category name / hotel.csv category -> code, filled in by app.py
+        self.encoding_tables = {}
+        self.model_code_tables = {}
+        self._rf_model = rf_model
+        self._rf_lock = threading.Lock()
+
+    @property
+    def rf_model(self):
+        """The pickled sklearn estimator, unpickled on first use."""
+        if self._rf_model is None and self.model_path and os.path.exists(self.model_path):
+            with self._rf_lock:
+                if self._rf_model is None:
+                    with open(self.model_path, "rb") as f:
+                        self._rf_model = pickle.load(f)
+        return self._rf_model
+
+
+def _load_pickle(path, what, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"Could not load {what}:", e)
+        return default
+
+
+def load_model_bundle(model_dir, mmap=False):
+    """Load the model, encoders and feature columns from `model_dir`.
+
+    Missing or unreadable files degrade like the original module-level
+    loading did: no model -> forest is None, no encoders -> {}, no feature
+    columns -> DEFAULT_FEATURE_COLS.
+    """
+    model_path = os.path.join(model_dir, MODEL_FILENAME)
+    encoders_path = os.path.join(model_dir, ENCODERS_FILENAME)
+    feature_cols_path = os.path.join(model_dir, FEATURE_COLS_FILENAME)
+    compact_path = os.path.join(model_dir, COMPACT_FOREST_FILENAME)
+
+    feature_cols = _load_pickle(feature_cols_path, "feature columns", list(DEFAULT_FEATURE_COLS))
+    if not os.path.exists(model_path) and not os.path.exists(compact_path):
+        return ModelBundle(None, None, _load_pickle(encoders_path, "encoders", {}), feature_cols, None)
+
+    version = files_digest(model_path, encoders_path, feature_cols_path, compact_path)
+    forest = encoders = rf_model = None
+    compacted = False
+    flat_path = os.path.join(model_dir, f"flat_forest-{version}.joblib")
+    classes_path = os.path.join(model_dir, f"encoder_classes-{version}.joblib")
+    if mmap and os.path.exists(classes_path):
+        try:
+            import joblib
+            encoders = {name: LabelClasses(c) for name, c in joblib.load(classes_path).items()}
+        except Exception as e:
+            print("Could not read cached encoder classes:", e)
+    if os.path.exists(compact_path):
+        try:
+            forest = FlatForest.load(compact_path, mmap_mode="r" if mmap else None)
+            compacted = True
+        except Exception as e:
+            print("Could not load compacted forest:", e)
+    elif mmap and os.path.exists(flat_path):
+        try:
+            forest = FlatForest.load(flat_path, mmap_mode="r")
+        except Exception as e:
+            print("Could not map flattened forest, rebuilding:", e)
+
+    if encoders is None:
+        encoders = _load_pickle(encoders_path, "encoders", {})
+        if mmap:
+            _write_cache(classes_path, lambda path: _dump_classes(encoders, path))
+
+    if forest is None:
+        rf_model = _load_pickle(model_path, "model", None)
+        if rf_model is None:
+            return ModelBundle(None, None, encoders, feature_cols, None)
+        forest = FlatForest.from_sklearn(rf_model)
+        if mmap and _write_cache(flat_path, forest.save):
+            forest = FlatForest.load(flat_path, mmap_mode="r")
+
+    return ModelBundle(model_path, forest, encoders, feature_cols, version, rf_model=rf_model, compacted=compacted)
+
+
+def _dump_classes(encoders, path):
+    import joblib
+    joblib.dump({name: np.asarray(le.classes_) for name, le in encoders.items()}, path)
+
+
+def _write_cache(path, write):
+    """Write-then-rename so concurrently starting workers never read a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        print(f"Could not write {os.path.basename(path)}:", e)
+        return False
@@ -0,0 +1,213 @@
+# model_registry.py - versioned model artifacts under model_files/
+"""
+Usage:
+    python model_registry.py publish [SOURCE_DIR] [--activate] [--notes TEXT]
+    python model_registry.py list
+    python model_registry.py verify [VERSION]
+    python model_registry.py activate VERSION
+
+Each published model is an immutable directory
+
+    model_files/versions/<version>/
+        random_forest_model.pkl  encoders.pkl  feature_cols.pkl  manifest.json
+        [compact_forest.joblib]  [training_state.json]
+
+where <version> is the content hash of the model files (the same id
+booking_predictions.model_version stores) and manifest.json records their
+sha256 checksums. model_files/ACTIVE names the version the app serves;
+running app processes notice a changed pointer, load the new version in the
+background and swap it in atomically. Without an ACTIVE file the app keeps
+loading the model files directly from model_files/.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+from model_bundle import (COMPACT_FOREST_FILENAME, ENCODERS_FILENAME, FEATURE_COLS_FILENAME,
+                          MODEL_FILENAME, files_digest, load_model_bundle)
+
+MODEL_FILES = (MODEL_FILENAME, ENCODERS_FILENAME, FEATURE_COLS_FILENAME)
+# Published along with the model files when the source directory has them
+OPTIONAL_MODEL_FILES = (COMPACT_FOREST_FILENAME,)
+# Training metadata: copied and checksummed like the model files, but not part of the version id
+TRAINING_STATE_FILENAME = "training_state.json"
+METADATA_FILES = (TRAINING_STATE_FILENAME,)
+MANIFEST_FILENAME = "manifest.json"
+ACTIVE_FILENAME = "ACTIVE"
+VERSIONS_DIRNAME = "versions"
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), "model_files")
+
+
+class RegistryError(Exception):
+    pass
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def version_dir(model_dir, version):
+    return os.path.join(model_dir, VERSIONS_DIRNAME, version)
+
+
+def read_manifest(model_dir, version):
+    path = os.path.join(version_dir(model_dir, version), MANIFEST_FILENAME)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise RegistryError(f"Unknown model version {version!r}")
+
+
+def list_versions(model_dir):
+    """Manifests of all published versions, oldest first."""
+    root = os.path.join(model_dir, VERSIONS_DIRNAME)
+    if not os.path.isdir(root):
+        return []
+    manifests = []
+    for name in os.listdir(root):
+        if os.path.exists(os.path.join(root, name, MANIFEST_FILENAME)):
+            manifests.append(read_manifest(model_dir, name))
+    return sorted(manifests, key=lambda m: m["created_at"])
+
+
+def verify(model_dir, version):
+    """Raise RegistryError unless every file of `version` matches its manifest checksum."""
+    manifest = read_manifest(model_dir, version)
+    vdir = version_dir(model_dir, version)
+    for name, expected in manifest["files"].items():
+        path = os.path.join(vdir, name)
+        if not os.path.exists(path):
+            raise RegistryError(f"{version}: missing {name}")
+        if sha256_file(path) != expected["sha256"]:
+            raise RegistryError(f"{version}: checksum mismatch for {name}")
+    return manifest
+
+
+def publish(model_dir, source_dir, notes=""):
+    """Copy the model files from `source_dir` into a new version; returns its id.
+
+    Publishing the same files twice returns the existing version.
+    """
+    missing = [name for name in MODEL_FILES if not os.path.exists(os.path.join(source_dir, name))]
+    if missing:
+        raise RegistryError(f"{source_dir} is missing {', '.join(missing)}")
+    names = [name for name in MODEL_FILES + OPTIONAL_MODEL_FILES if os.path.exists(os.path.join(source_dir, name))]
+    sources = [os.path.join(source_dir, name) for name in names]
+    metadata = [name for name in METADATA_FILES if os.path.exists(os.path.join(source_dir, name))]
+
+    # Same digest (file order and all) as load_model_bundle() computes
+    version = files_digest(*sources)
+    final_dir = version_dir(model_dir, version)
+    if os.path.exists(os.path.join(final_dir, MANIFEST_FILENAME)):
+        return version
+
+    # Build the version in a scratch directory and rename it into place, so a
+    # version directory with a manifest is always complete
+    tmp_dir = os.path.join(model_dir, VERSIONS_DIRNAME, f".{version}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        files = {}
+        for name in names + metadata:
+            path = os.path.join(source_dir, name)
+            shutil.copy2(path, os.path.join(tmp_dir, name))
+            files[name] = {"sha256": sha256_file(os.path.join(tmp_dir, name)),
+                           "size": os.path.getsize(path)}
+        if files_digest(*(os.path.join(tmp_dir, name) for name in names)) != version:
+            raise RegistryError(f"{source_dir} changed while it was being published")
+        manifest = {
+            "version": version,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "source": os.path.abspath(source_dir),
+            "notes": notes,
+            "files": files,
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_FILENAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+        shutil.rmtree(final_dir, ignore_errors=True)
+        os.rename(tmp_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return version
+
+
+def active_version(model_dir):
+    """The version named by model_files/ACTIVE, or None for the unversioned layout."""
+    try:
+        with open(os.path.join(model_dir, ACTIVE_FILENAME)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def activate(model_dir, version):
+    """Point ACTIVE at a verified version (write-then-rename, so readers never see a partial id)."""
+    verify(model_dir, version)
+    path = os.path.join(model_dir, ACTIVE_FILENAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, path)
+
+
+def load_version(model_dir, version, mmap=False):
+    """Verify and load a published version as a ModelBundle."""
+    verify(model_dir, version)
+    bundle = load_model_bundle(version_dir(model_dir, version), mmap=mmap)
+    if bundle.forest is None or bundle.version != version:
+        raise RegistryError(f"{version}: model files could not be loaded")
+    return bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR, help="registry root (default: model_files/)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    p = commands.add_parser("publish", help="publish a trained model as a new version")
+    p.add_argument("source_dir", nargs="?", help="directory with the model files (default: registry root)")
+    p.add_argument("--activate", action="store_true", help="make it the active version")
+    p.add_argument("--notes", default="", help="free-text note stored in the manifest")
+    commands.add_parser("list", help="list published versions")
+    p = commands.add_parser("verify", help="check manifest checksums")
+    p.add_argument("version", nargs="?", help="version to check (default: all)")
+    p = commands.add_parser("activate", help="switch the served version")
+    p.add_argument("version")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "publish":
+            version = publish(args.model_dir, args.source_dir or args.model_dir, args.notes)
+            print(f"Published {version}")
+            if args.activate:
+                activate(args.model_dir, version)
+                print(f"Activated {version}")
+        elif args.command == "list":
+            active = active_version(args.model_dir)
+            for m in list_versions(args.model_dir):
+                marker = "*" if m["version"] == active else " "
+                print(f"{marker} {m['version']}  {m['created_at']}  {m['notes']}")
+        elif args.command == "verify":
+            versions = [args.version] if args.version else [m["version"] for m in list_versions(args.model_dir)]
+            for version in versions:
+                verify(args.model_dir, version)
+                print(f"{version}: OK")
+        elif args.command == "activate":
+            activate(args.model_dir, args.version)
+            print(f"Activated {args.version}; running app processes switch within a few seconds")
+    except RegistryError as e:
+        sys.exit(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# rebuild_room_nights.py - regenerate the room_nights occupancy table from bookings
+"""
+Usage:
+    python rebuild_room_nights.py [--db hotel_booking.db] [--check]
+
+room_nights holds one row per booked night of every active booking and is
+kept up to date by the app in the same transaction as each booking insert
+and cancellation. This rebuilds it from the bookings table, e.g. after
+bookings were imported or edited outside the app (older databases are
+migrated first). --check opens the database read-only and reports how far
+the table is from a fresh rebuild; it fails if the database predates
+room_nights.
+
+Nights claimed by more than one active booking (possible only in data
+written before room_nights existed) go to the lowest booking_id and are
+reported as conflicts.
+"""
+import argparse
+import sqlite3
+import sys
+import time
+
+import app as hotel_app
+
+
+def expected_room_nights(conn):
+    """(set of (room_id, night_date, booking_id) a rebuild would write, conflicting nights) without writing."""
+    nights_sql = hotel_app.ROOM_NIGHTS_SQL.format(where_sql="1")
+    total = conn.execute(f"SELECT COUNT(*) FROM ({nights_sql})").fetchone()[0]
+    # A rebuild inserts in booking_id order and ignores taken nights, so the lowest booking_id wins
+    expected = set(conn.execute(f"SELECT room_id, night_date, MIN(booking_id) FROM ({nights_sql}) "
+                                "GROUP BY room_id, night_date"))
+    return expected, total - len(expected)
+
+
+def check(db_path):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(bookings)")}
+        if "room_nights" not in tables or not {"checkin_date", "checkout_date"} <= columns:
+            sys.exit(f"Error: {db_path} has no room_nights table; run without --check to migrate and build it")
+        before = set(conn.execute("SELECT room_id, night_date, booking_id FROM room_nights"))
+        after, conflicts = expected_room_nights(conn)
+    finally:
+        conn.close()
+    print(f"{len(after - before):,} nights missing, {len(before - after):,} stale "
+          f"({len(after):,} nights, {conflicts:,} conflicts)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=hotel_app.DB_PATH, help="bookings database (default: app database)")
+    parser.add_argument("--check", action="store_true", help="compare against a rebuild without writing")
+    args = parser.parse_args()
+
+    if args.check:
+        check(args.db)
+        return
+    hotel_app.init_db(args.db)  # adds room_nights and the stay columns to older databases
+    conn = sqlite3.connect(args.db)
+    try:
+        start = time.perf_counter()
+        nights, conflicts = hotel_app.rebuild_room_nights(conn)
+        elapsed = time.perf_counter() - start
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Rebuilt room_nights: {nights:,} nights, {conflicts:,} conflicting nights skipped, in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
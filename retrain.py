@@ -0,0 +1,195 @@
+# retrain.py - incremental retraining of the served forest from finished bookings
+"""
+Usage:
+    python retrain.py [--db hotel_booking.db] [--trees 20] [--mode grow|replace]
+                      [--replay-rows 20000] [--tolerance 0.0] [--activate]
+
+Updates the active model (model_files/ACTIVE, or model_files/ itself when no
+version is active) with bookings whose outcome became final since it was
+trained, instead of refitting all trees on the whole history:
+
+1. bookings whose outcome became final since the active version was trained
+   are read and mapped to hotel.csv categories (MEAL_MAP / ROOM_MAP /
+   SEGMENT_MAP, via app.training_record). The version's training_state.json
+   holds the high-water marks of the run that trained it: stays that ended
+   up to `final_through` and cancellations recorded up to
+   `canceled_through`, so only rows past them are queried. Bookings with
+   booking_id % 5 == 0 are a permanent live holdout and never trained on;
+2. --trees new trees are fitted (warm_start) on the new bookings plus
+   --replay-rows rows sampled from the training part of train.ipynb's split,
+   so each run costs the same however long the history gets. --mode grow
+   adds them to the forest; --mode replace drops the oldest trees first and
+   keeps the forest size;
+3. old and new forests are scored on train.ipynb's 20% test split plus the
+   live holdout. The new version is published to the registry only if its
+   ROC-AUC is no more than --tolerance below the old one.
+
+A model trained by train.py --db has no training_state.json, so its
+first incremental run treats every non-holdout final booking as new.
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+import model_registry
+from app import FINAL_CHECKOUT_SQL
+from dataset_cache import CACHE_DIR, export_bookings, load_dataset
+from model_bundle import ENCODERS_FILENAME, FEATURE_COLS_FILENAME, MODEL_FILENAME
+from train import save_artifacts
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# Bookings with booking_id % HOLDOUT_MODULUS == 0 are only ever used for evaluation
+HOLDOUT_MODULUS = 5
+HOLDOUT_SQL = f"b.booking_id % {HOLDOUT_MODULUS} = 0"
+
+# Training bookings that became final between the source model's high-water marks and this
+# run's: stays that ended after :final_through, cancellations recorded after :canceled_through
+# (updated_at, like the marks, is UTC)
+NEW_BOOKINGS_SQL = f"""
+    b.booking_id % {HOLDOUT_MODULUS} != 0
+    AND CASE WHEN b.booking_status = 'Canceled'
+             THEN b.updated_at > :canceled_through AND b.updated_at <= :now
+             ELSE {FINAL_CHECKOUT_SQL} > :final_through AND {FINAL_CHECKOUT_SQL} <= :today END
+"""
+
+# High-water marks of a model no incremental run has trained: every final booking is new
+INITIAL_STATE = {"final_through": "", "canceled_through": "", "bookings_trained": 0}
+
+
+def load_source(model_dir):
+    """(version, directory, rf_model, encoders, feature_cols, training state) of the served model."""
+    version = model_registry.active_version(model_dir)
+    source_dir = model_dir
+    if version is not None:
+        model_registry.verify(model_dir, version)
+        source_dir = model_registry.version_dir(model_dir, version)
+    loaded = []
+    for name in (MODEL_FILENAME, ENCODERS_FILENAME, FEATURE_COLS_FILENAME):
+        with open(os.path.join(source_dir, name), "rb") as f:
+            loaded.append(pickle.load(f))
+    state = dict(INITIAL_STATE)
+    state_path = os.path.join(source_dir, model_registry.TRAINING_STATE_FILENAME)
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state.update(json.load(f))
+    return (version, source_dir, *loaded, state)
+
+
+def encode_records(records, encoders, feature_cols):
+    """hotel.csv-format records -> (float32 feature matrix, 0/1 labels)."""
+    df = pd.DataFrame.from_records(records)
+    for col, le in encoders.items():
+        df[col + "_encoded"] = le.transform(df[col])
+    df["total_nights"] = df["no_of_weekend_nights"] + df["no_of_week_nights"]
+    df["total_guests"] = df["no_of_adults"] + df["no_of_children"]
+    return df[feature_cols].to_numpy(np.float32), (df["booking_status"] == "Canceled").to_numpy(np.int8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.path.join(BASE_DIR, "hotel_booking.db"), help="bookings database")
+    parser.add_argument("--csv", default=os.path.join(BASE_DIR, "hotel.csv"), help="original training data")
+    parser.add_argument("--model-dir", default=model_registry.DEFAULT_MODEL_DIR, help="registry root")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="dataset cache root (default: dataset_cache/)")
+    parser.add_argument("--trees", type=int, default=20, help="trees fitted per run (default: 20)")
+    parser.add_argument("--mode", choices=("grow", "replace"), default="grow",
+                        help="add the new trees, or replace the oldest ones (default: grow)")
+    parser.add_argument("--replay-rows", type=int, default=20_000,
+                        help="hotel.csv training rows mixed into the new bookings (default: 20000)")
+    parser.add_argument("--min-bookings", type=int, default=1, help="skip the run with fewer new bookings")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="allowed holdout ROC-AUC drop")
+    parser.add_argument("--activate", action="store_true", help="activate the published version")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    version, source_dir, rf_model, encoders, feature_cols, state = load_source(args.model_dir)
+    if not hasattr(rf_model, "estimators_"):
+        sys.exit("Error: incremental retraining needs a random forest model; retrain others with train.py")
+    print(f"Active model: {version or source_dir} ({len(rf_model.estimators_)} trees, "
+          f"{state['bookings_trained']:,} bookings trained on)")
+
+    # This run's high-water marks, in the UTC format of date('now') / CURRENT_TIMESTAMP
+    now = datetime.now(timezone.utc)
+    marks = {"final_through": now.strftime("%Y-%m-%d"), "canceled_through": now.strftime("%Y-%m-%d %H:%M:%S")}
+    new = export_bookings(args.db, NEW_BOOKINGS_SQL, {"final_through": state["final_through"],
+                                                      "canceled_through": state["canceled_through"],
+                                                      "today": marks["final_through"],
+                                                      "now": marks["canceled_through"]})
+    holdout = export_bookings(args.db, HOLDOUT_SQL)
+    print(f"{len(new):,} bookings final since {state['final_through'] or 'the start'}, "
+          f"{len(holdout):,} in the live holdout")
+    if len(new) < args.min_bookings:
+        print("Nothing to retrain")
+        return
+
+    # hotel.csv rows: replay sample from the notebook's training split, its test split for evaluation
+    dataset = load_dataset(args.csv, cache_dir=args.cache_dir)
+    cached_classes = {col: list(le.classes_) for col, le in encoders.items()}
+    if dataset.classes != cached_classes:
+        sys.exit("Error: the model's encoders do not match hotel.csv's categories; retrain with train.py")
+    y_base = np.asarray(dataset.label)
+    train_idx, test_idx = train_test_split(np.arange(len(y_base)), test_size=0.2, random_state=42, stratify=y_base)
+    trained = state["bookings_trained"] + len(new)
+    rng = np.random.default_rng(trained)
+    replay_idx = np.sort(rng.choice(train_idx, size=min(args.replay_rows, len(train_idx)), replace=False))
+
+    X_new, y_new = encode_records(new, encoders, feature_cols)
+    X_fit = np.concatenate([dataset.matrix(feature_cols, replay_idx), X_new])
+    y_fit = np.concatenate([y_base[replay_idx], y_new])
+    X_eval, y_eval = dataset.matrix(feature_cols, test_idx), y_base[test_idx]
+    if holdout:
+        X_live, y_live = encode_records(holdout, encoders, feature_cols)
+        X_eval, y_eval = np.concatenate([X_eval, X_live]), np.concatenate([y_eval, y_live])
+    X_eval = pd.DataFrame(X_eval, columns=feature_cols, copy=False)
+
+    old_auc = roc_auc_score(y_eval, rf_model.predict_proba(X_eval)[:, 1])
+    n_before = len(rf_model.estimators_)
+    if args.mode == "replace":
+        rf_model.estimators_ = rf_model.estimators_[min(args.trees, n_before - 1):]
+    # warm_start keeps the fitted trees and fits only the missing ones; a fresh seed per
+    # run keeps the new trees from repeating earlier bootstrap draws
+    rf_model.set_params(warm_start=True, n_estimators=len(rf_model.estimators_) + args.trees,
+                        random_state=trained, n_jobs=args.n_jobs)
+    fit_start = time.perf_counter()
+    rf_model.fit(pd.DataFrame(X_fit, columns=feature_cols, copy=False), y_fit)
+    fit_seconds = time.perf_counter() - fit_start
+    rf_model.set_params(warm_start=False)
+    new_auc = roc_auc_score(y_eval, rf_model.predict_proba(X_eval)[:, 1])
+
+    print(f"Fitted {args.trees} trees on {len(y_fit):,} rows in {fit_seconds:.2f}s "
+          f"({n_before} -> {len(rf_model.estimators_)} trees)")
+    print(f"Holdout ROC-AUC ({len(y_eval):,} rows): {old_auc:.4f} -> {new_auc:.4f}")
+    if new_auc < old_auc - args.tolerance:
+        sys.exit(f"Not published: ROC-AUC dropped by {old_auc - new_auc:.4f} (tolerance {args.tolerance})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        save_artifacts(tmp, rf_model, encoders, feature_cols)
+        with open(os.path.join(tmp, model_registry.TRAINING_STATE_FILENAME), "w") as f:
+            json.dump(dict(marks, bookings_trained=trained), f, indent=2)
+        notes = (f"incremental ({args.mode}) from {version or 'model_files'}: +{args.trees} trees, "
+                 f"{len(new)} new bookings, ROC-AUC {old_auc:.4f} -> {new_auc:.4f}")
+        try:
+            new_version = model_registry.publish(args.model_dir, tmp, notes)
+            print(f"Published {new_version}")
+            if args.activate:
+                model_registry.activate(args.model_dir, new_version)
+                print(f"Activated {new_version}")
+        except model_registry.RegistryError as e:
+            sys.exit(f"Error: {e}")
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
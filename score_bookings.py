@@ -0,0 +1,165 @@
+# score_bookings.py - offline cancellation scoring for CSV files and the bookings table
+"""
+Usage:
+    python score_bookings.py hotel.csv -o scores.csv
+    python score_bookings.py --db hotel_booking.db -o scores.parquet --workers 4
+
+Reads the input in fixed-size chunks (hotel.csv columns, or the bookings
+table joined with its meal plan / room type / segment names), scores the
+chunks across a process pool and writes booking id, probability, prediction,
+risk level and model version to CSV or Parquet (.parquet, needs pyarrow).
+At most 2 x workers chunks are in flight at any time, so memory stays bounded
+whatever the input size.
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import app as hotel_app
+
+OUTPUT_COLUMNS = ["booking_id", "cancellation_probability", "prediction", "risk_level", "model_version", "error"]
+
+BOOKINGS_QUERY = hotel_app.SCORING_ROWS_SQL + " ORDER BY b.booking_id"
+
+
+def iter_csv_chunks(path, chunk_size):
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        # NaN -> None so missing optional columns fall back to their defaults
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        yield chunk.to_dict("records")
+
+
+def iter_db_chunks(db_path, chunk_size):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        cursor = conn.execute(BOOKINGS_QUERY)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def score_chunk(records):
+    """Worker: score one chunk and return output rows."""
+    bundle = hotel_app.get_model_bundle()
+    out = []
+    for record, (prob, error) in zip(records, hotel_app.score_records(records, bundle)):
+        if error is not None:
+            out.append((hotel_app.record_booking_id(record), None, None, None, None, error))
+        else:
+            prediction, risk_level = hotel_app.risk_assessment(prob)
+            out.append((hotel_app.record_booking_id(record), prob, prediction, risk_level, bundle.version, None))
+    return out
+
+
+class CsvSink:
+    def __init__(self, path):
+        self.f = open(path, "w", newline="")
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(OUTPUT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetSink:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.schema = pa.schema([
+            ("booking_id", pa.string()),
+            ("cancellation_probability", pa.float64()),
+            ("prediction", pa.string()),
+            ("risk_level", pa.string()),
+            ("model_version", pa.string()),
+            ("error", pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        columns[0] = [None if v is None else str(v) for v in columns[0]]
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(col, type=field.type) for col, field in zip(columns, self.schema)],
+            schema=self.schema,
+        ))
+
+    def close(self):
+        self.writer.close()
+
+
+def run(chunks, sink, workers):
+    """Score chunks in order, keeping at most 2 x workers of them in flight."""
+    total = errors = 0
+    start = time.perf_counter()
+
+    def consume(rows):
+        nonlocal total, errors
+        sink.write(rows)
+        total += len(rows)
+        errors += sum(1 for r in rows if r[-1] is not None)
+        elapsed = time.perf_counter() - start
+        print(f"\rScored {total:,} rows ({total / elapsed:,.0f} rows/s)", end="", file=sys.stderr, flush=True)
+
+    if workers <= 1:
+        for chunk in chunks:
+            consume(score_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(score_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    consume(pending.popleft().result())
+            while pending:
+                consume(pending.popleft().result())
+
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    return total, errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("csv_path", nargs="?", help="hotel.csv-format input file")
+    source.add_argument("--db", nargs="?", const=hotel_app.DB_PATH, help="score the bookings table (default: app database)")
+    parser.add_argument("-o", "--output", required=True, help="output .csv or .parquet file")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per chunk (default: 5000)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if hotel_app.get_model_bundle().forest is None:
+        raise SystemExit(f"No model found at {hotel_app.RF_MODEL_PATH}")
+
+    chunks = iter_db_chunks(args.db, args.chunk_size) if args.db else iter_csv_chunks(args.csv_path, args.chunk_size)
+    sink = ParquetSink(args.output) if args.output.endswith(".parquet") else CsvSink(args.output)
+    try:
+        total, errors, elapsed = run(chunks, sink, args.workers)
+    finally:
+        sink.close()
+
+    print(f"Scored {total:,} rows in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/s), "
+          f"{errors:,} errors -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# scoring_worker.py - background scoring of new/modified bookings
+"""
+Small in-process worker pool that takes booking ids off a queue and hands
+them, in batches, to a scoring callback. Used by app.py so that booking
+inserts and updates never wait on the model: the request only enqueues the
+id, and admin pages read the stored prediction.
+"""
+import queue
+import threading
+
+
+class BackgroundScorer:
+    def __init__(self, score_batch, workers=2, batch_size=256, max_queue=10000):
+        """
+        score_batch: callable(list_of_booking_ids) that scores and stores them.
+        Ids submitted without blocking while the queue is full are left
+        unscored and counted in `dropped`; they are picked up by the next
+        backlog drain or by read-time scoring.
+        """
+        self.score_batch = score_batch
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.scored = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def running(self):
+        return bool(self._threads)
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"booking-scorer-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, booking_ids, block=False):
+        """Queue booking ids for scoring.
+
+        By default the caller never waits and ids that do not fit are
+        dropped. block=True waits for queue space instead, for backlog
+        drains running on their own thread.
+        """
+        dropped = 0
+        for booking_id in booking_ids:
+            if block:
+                self.queue.put(booking_id)
+                continue
+            try:
+                self.queue.put_nowait(booking_id)
+            except queue.Full:
+                dropped += 1
+        if dropped:
+            with self._lock:
+                self.dropped += dropped
+            print(f"Scoring queue full: {dropped} booking(s) left for the next backlog drain")
+
+    def join(self):
+        """Block until everything queued so far has been processed."""
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                # Same booking may be queued twice (insert + update); score it once
+                self.score_batch(list(dict.fromkeys(batch)))
+                with self._lock:
+                    self.scored += len(batch)
+            except Exception as e:
+                with self._lock:
+                    self.failed += len(batch)
+                print(f"Background scoring failed for {len(batch)} booking(s): {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
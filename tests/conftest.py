@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import app as hotel_app
+
+
+class RecordingScorer:
+    """Stands in for the background scorer; keeps the booking ids it is handed."""
+
+    running = True  # keeps start_background_scoring from starting threads
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, booking_ids, block=False):
+        self.submitted.extend(booking_ids)
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A fresh app database: one customer, room type, meal plan and segment, rooms 101 and 102."""
+    path = str(tmp_path / "hotel_booking.db")
+    monkeypatch.setattr(hotel_app, "DB_PATH", path)
+    monkeypatch.setattr(hotel_app, "_availability_cache", {})
+    monkeypatch.setattr(hotel_app, "background_scorer", RecordingScorer())
+    monkeypatch.setitem(hotel_app.app.config, "INITIALIZED", False)
+    hotel_app.create_app()
+
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO customers (name, email, password) VALUES ('Guest', 'guest@example.com', ?)",
+                 (generate_password_hash("secret"),))
+    conn.execute("INSERT INTO room_types (room_type_name, price_per_night, max_guests) VALUES ('Standard', 100, 2)")
+    conn.executemany("INSERT INTO rooms (room_number, room_type_id, price_per_night) VALUES (?, 1, 100)",
+                     [("101",), ("102",)])
+    conn.execute("INSERT INTO meal_plans (meal_plan_name) VALUES ('Mixed')")
+    conn.execute("INSERT INTO market_segments (segment_name) VALUES ('Online')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def client(db_path):
+    """Test client logged in as the seeded customer."""
+    hotel_app.app.config["TESTING"] = True
+    with hotel_app.app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess["user_id"] = 1
+        yield client
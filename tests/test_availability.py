@@ -0,0 +1,121 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+import app as hotel_app
+
+
+def book(client, checkin, nights, room_id=1):
+    payload = {
+        "room_id": room_id, "room_number": str(100 + room_id), "meal_plan_id": 1, "market_segment_id": 1,
+        "no_of_adults": 2, "no_of_children": 0, "no_of_weekend_nights": 0, "no_of_week_nights": nights,
+        "lead_time": 30, "arrival_year": checkin.year, "arrival_month": checkin.month,
+        "arrival_date": checkin.day, "avg_price_per_room": 100.0, "total_nights": nights, "total_guests": 2,
+    }
+    return client.post(f"/book_room/{room_id}", json=payload)
+
+
+def room_nights(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT room_id, night_date, booking_id FROM room_nights ORDER BY night_date").fetchall()
+    finally:
+        conn.close()
+
+
+def test_overlapping_booking_is_rejected(client, db_path):
+    assert book(client, date(2030, 1, 10), 3).get_json()["success"]
+
+    response = book(client, date(2030, 1, 12), 2)
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Room unavailable for selected dates."
+    # Checkout is exclusive: back-to-back stays and other rooms are fine
+    assert book(client, date(2030, 1, 13), 2).get_json()["success"]
+    assert book(client, date(2030, 1, 11), 2, room_id=2).get_json()["success"]
+
+    assert [n for n in room_nights(db_path) if n[0] == 1] == [
+        (1, "2030-01-10", 1), (1, "2030-01-11", 1), (1, "2030-01-12", 1), (1, "2030-01-13", 2), (1, "2030-01-14", 2),
+    ]
+    assert hotel_app.background_scorer.submitted == [1, 2, 3]
+
+
+def test_claim_room_nights_rejects_taken_nights(client, db_path):
+    assert book(client, date(2030, 1, 10), 3).get_json()["success"]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        with pytest.raises(sqlite3.IntegrityError):
+            hotel_app.claim_room_nights(conn, 99, 1, date(2030, 1, 8), date(2030, 1, 11))
+    finally:
+        conn.close()
+
+
+def test_cancelling_frees_nights(client, db_path):
+    assert book(client, date(2030, 1, 10), 3).get_json()["success"]
+    stay = {"checkin": "2030-01-10", "checkout": "2030-01-13"}
+    assert [r["room_number"] for r in client.get("/api/availability", query_string=stay).get_json()["rooms"]] == ["102"]
+
+    assert client.post("/cancel_booking/1").status_code == 302
+
+    assert room_nights(db_path) == []
+    assert [r["room_number"] for r in client.get("/api/availability", query_string=stay).get_json()["rooms"]] == [
+        "101", "102"]
+    assert client.get("/api/rooms/1/unavailable").get_json() == {"ranges": []}
+    assert book(client, date(2030, 1, 11), 1).get_json()["success"]
+
+
+def test_ranges_and_bits_are_clipped_to_the_window(client):
+    for checkin, nights in ((date(2030, 1, 10), 3), (date(2030, 1, 13), 2), (date(2030, 1, 20), 2)):
+        assert book(client, checkin, nights).get_json()["success"]
+
+    # Back-to-back bookings come back merged
+    assert client.get("/api/rooms/1/unavailable").get_json()["ranges"] == [
+        {"start": "2030-01-10", "end": "2030-01-15"}, {"start": "2030-01-20", "end": "2030-01-22"}]
+
+    window = {"from": "2030-01-12", "to": "2030-01-21"}
+    assert client.get("/api/rooms/1/unavailable", query_string=window).get_json() == {
+        "from": "2030-01-12", "to": "2030-01-21",
+        "ranges": [{"start": "2030-01-12", "end": "2030-01-15"}, {"start": "2030-01-20", "end": "2030-01-21"}],
+    }
+    bits = client.get("/api/rooms/1/unavailable", query_string=dict(window, format="bits")).get_json()["bits"]
+    assert bits == "111" + "00000" + "1"
+    # A window starting on a checkout day sees that night as free
+    edge = {"from": "2030-01-15", "to": "2030-01-20", "format": "bits"}
+    assert client.get("/api/rooms/1/unavailable", query_string=edge).get_json()["bits"] == "00000"
+
+
+def test_unavailable_ranges_etag_changes_with_bookings(client):
+    assert book(client, date(2030, 1, 10), 3).get_json()["success"]
+    first = client.get("/api/rooms/1/unavailable")
+    etag = first.headers["ETag"]
+
+    assert client.get("/api/rooms/1/unavailable", headers={"If-None-Match": etag}).status_code == 304
+    assert book(client, date(2030, 1, 20), 1).get_json()["success"]
+    second = client.get("/api/rooms/1/unavailable", headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("param", [
+    {"guests": "two"}, {"guests": "1.5"}, {"room_type": "x"}, {"page": ""}, {"per_page": "10abc"},
+])
+def test_availability_rejects_non_integer_params(client, param):
+    query = dict({"checkin": "2030-01-10", "checkout": "2030-01-12"}, **param)
+
+    response = client.get("/api/availability", query_string=query)
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+def test_availability_filters_and_pages(client):
+    stay = {"checkin": "2030-01-10", "checkout": "2030-01-12"}
+    assert client.get("/api/availability", query_string=dict(stay, guests=3)).get_json()["rooms"] == []
+
+    page = client.get("/api/availability", query_string=dict(stay, per_page=1)).get_json()
+    assert [r["room_number"] for r in page["rooms"]] == ["101"]
+    assert page["has_more"] is True
+    page = client.get("/api/availability", query_string=dict(stay, per_page=1, page=2)).get_json()
+    assert [r["room_number"] for r in page["rooms"]] == ["102"]
+    assert page["has_more"] is False
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from app import RISK_THRESHOLDS
+from forest_engine import FlatForest
+
+
+def fit_forest(seed, n_estimators=100):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(2000, 5))
+    y = (X[:, 0] + 0.5 * X[:, 1] ** 2 + rng.normal(scale=0.5, size=len(X)) > 0.5).astype(int)
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=8, random_state=seed).fit(X, y)
+    return FlatForest.from_sklearn(model), rng.normal(size=(2000, 5))
+
+
+def full_buckets(forest, X):
+    p = forest.predict_proba(X)[:, 1]
+    return np.sum(p[:, None] > np.asarray(RISK_THRESHOLDS), axis=1)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("block_trees", [1, 10])
+def test_predict_bucket_matches_full_evaluation(seed, block_trees):
+    forest, X = fit_forest(seed)
+
+    buckets, trees_evaluated = forest.predict_bucket(X, RISK_THRESHOLDS, block_trees=block_trees, delta=None)
+
+    np.testing.assert_array_equal(buckets, full_buckets(forest, X))
+    assert trees_evaluated.max() <= forest.n_trees
+    # Early exit must actually skip trees: on average, and for rows that stop before the last block
+    assert trees_evaluated.mean() < forest.n_trees
+    assert (trees_evaluated <= forest.n_trees - block_trees).any()
+
+
+@pytest.mark.parametrize("delta", [1e-3, 1e-2])
+def test_predict_bucket_hoeffding_mode(delta):
+    forest, X = fit_forest(0)
+    _, exact_trees = forest.predict_bucket(X, RISK_THRESHOLDS, delta=None)
+
+    buckets, trees_evaluated = forest.predict_bucket(X, RISK_THRESHOLDS, delta=delta)
+
+    # The bound may, rarely, stop a row on the wrong side of a threshold
+    assert np.mean(buckets == full_buckets(forest, X)) >= 0.98
+    assert trees_evaluated.mean() < exact_trees.mean()
+
+
+def test_predict_bucket_matches_full_evaluation_after_compaction():
+    forest, X = fit_forest(3)
+    compact = forest.compact()
+
+    buckets, trees_evaluated = compact.predict_bucket(X, RISK_THRESHOLDS, delta=None)
+
+    np.testing.assert_array_equal(buckets, full_buckets(compact, X))
+    assert trees_evaluated.mean() < compact.n_trees
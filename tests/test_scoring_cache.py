@@ -0,0 +1,141 @@
+import os
+import pickle
+import sqlite3
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import app as hotel_app
+from forest_engine import FlatForest
+from model_bundle import ENCODERS_FILENAME, FEATURE_COLS_FILENAME, ModelBundle
+
+MODEL_FILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_files")
+
+
+def make_bundle(version, seed=0):
+    """A small forest over the served feature layout; predictions depend on meal plan and lead time."""
+    with open(os.path.join(MODEL_FILES, ENCODERS_FILENAME), "rb") as f:
+        encoders = pickle.load(f)
+    with open(os.path.join(MODEL_FILES, FEATURE_COLS_FILENAME), "rb") as f:
+        feature_cols = pickle.load(f)
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 100, size=(500, len(feature_cols))).astype(np.float64)
+    X[:, feature_cols.index("type_of_meal_plan_encoded")] %= 4
+    y = (X[:, feature_cols.index("type_of_meal_plan_encoded")] + X[:, feature_cols.index("lead_time")] / 50 > 2)
+    model = RandomForestClassifier(n_estimators=10, max_depth=4, random_state=seed).fit(X, y.astype(int))
+    return ModelBundle(None, FlatForest.from_sklearn(model), encoders, feature_cols, version, rf_model=model)
+
+
+@pytest.fixture
+def bundle(db_path, monkeypatch):
+    bundle = make_bundle("v1")
+    hotel_app.build_encoding_tables(bundle)
+    monkeypatch.setattr(hotel_app, "_model_bundle", bundle)
+    return bundle
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executemany("""
+        INSERT INTO bookings (
+            customer_id, room_id, meal_plan_id, market_segment_id, booking_status,
+            no_of_adults, no_of_children, no_of_weekend_nights, no_of_week_nights, lead_time,
+            arrival_year, arrival_month, arrival_date, avg_price_per_room, total_nights, total_guests
+        ) VALUES (1, ?, 1, 1, 'Not_Canceled', 2, 0, 1, 2, ?, 2030, 1, ?, 100.0, 3, 2)
+    """, [(1, 10, 1), (2, 80, 1), (1, 150, 10)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def scoring_rows(conn):
+    return conn.execute(hotel_app.SCORING_ROWS_SQL + " ORDER BY b.booking_id").fetchall()
+
+
+def stored(conn):
+    return {r["booking_id"]: (r["feature_hash"], r["model_version"], r["cancellation_probability"])
+            for r in conn.execute("SELECT * FROM booking_predictions")}
+
+
+@pytest.fixture
+def scored_rows(monkeypatch):
+    """Number of rows each predict_probabilities call scored."""
+    calls = []
+    predict = hotel_app.predict_probabilities
+
+    def counting(bundle, X):
+        calls.append(len(X))
+        return predict(bundle, X)
+
+    monkeypatch.setattr(hotel_app, "predict_probabilities", counting)
+    return calls
+
+
+def test_predictions_are_cached_by_feature_hash_and_model_version(bundle, conn, scored_rows):
+    rows = scoring_rows(conn)
+
+    probabilities = hotel_app.cached_cancellation_probabilities(conn, rows)
+
+    X = hotel_app.build_feature_matrix(bundle, rows)
+    np.testing.assert_allclose(probabilities, bundle.forest.predict_proba(X)[:, 1])
+    assert stored(conn) == {
+        row["booking_id"]: (hotel_app.feature_hash(x), "v1", p) for row, x, p in zip(rows, X, probabilities)
+    }
+    assert scored_rows == [3]
+
+    np.testing.assert_array_equal(hotel_app.cached_cancellation_probabilities(conn, rows), probabilities)
+    assert scored_rows == [3]
+
+
+def test_edited_booking_is_rescored(bundle, conn, scored_rows):
+    hotel_app.cached_cancellation_probabilities(conn, scoring_rows(conn))
+    before = stored(conn)
+
+    conn.execute("UPDATE bookings SET lead_time = 300 WHERE booking_id = 2")
+    conn.commit()
+    hotel_app.cached_cancellation_probabilities(conn, scoring_rows(conn))
+
+    after = stored(conn)
+    assert scored_rows == [3, 1]
+    assert after[2][0] != before[2][0]
+    assert {k: v for k, v in after.items() if k != 2} == {k: v for k, v in before.items() if k != 2}
+
+
+def test_delete_meal_plan_invalidates_and_requeues_bookings(bundle, conn, client):
+    conn.execute("INSERT INTO meal_plans (meal_plan_name) VALUES ('No Meal')")
+    conn.commit()
+    hotel_app.cached_cancellation_probabilities(conn, scoring_rows(conn))
+    before = stored(conn)
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+
+    response = client.post("/admin/delete_meal_plan/1", data={"reassign_to": 2})
+
+    assert response.status_code == 302
+    assert stored(conn) == {}
+    assert sorted(hotel_app.background_scorer.submitted) == [1, 2, 3]
+
+    hotel_app.score_bookings_by_id([1, 2, 3])
+    after = stored(conn)
+    assert sorted(after) == [1, 2, 3]
+    assert all(after[i][0] != before[i][0] for i in after)
+
+
+def test_model_version_change_marks_predictions_stale(bundle, conn, scored_rows, monkeypatch):
+    hotel_app.cached_cancellation_probabilities(conn, scoring_rows(conn))
+    assert hotel_app.unscored_booking_ids(bundle) == []
+
+    new_bundle = make_bundle("v2", seed=1)
+    hotel_app.build_encoding_tables(new_bundle)
+    monkeypatch.setattr(hotel_app, "_model_bundle", new_bundle)
+
+    assert hotel_app.unscored_booking_ids(new_bundle) == [1, 2, 3]
+    probabilities = hotel_app.cached_cancellation_probabilities(conn, scoring_rows(conn))
+    assert scored_rows == [3, 3]
+    X = hotel_app.build_feature_matrix(new_bundle, scoring_rows(conn))
+    np.testing.assert_allclose(probabilities, new_bundle.forest.predict_proba(X)[:, 1])
+    assert {version for _, version, _ in stored(conn).values()} == {"v2"}
+    assert hotel_app.unscored_booking_ids(new_bundle) == []
@@ -0,0 +1,157 @@
+# train.py - memory-bounded training of the cancellation model (replaces train.ipynb)
+"""
+Usage:
+    python train.py [--csv hotel.csv] [--db hotel_booking.db] [-o model_files]
+                    [--engine forest | --engine hgb]
+    python model_registry.py publish model_files --activate
+
+Same model, split and artifacts as train.ipynb (random_forest_model.pkl,
+encoders.pkl, feature_cols.pkl), built without holding copies of the data:
+
+1. the data is read from the columnar dataset cache (dataset_cache.py),
+   which streams hotel.csv in chunks with compact dtypes the first time and
+   is memory-mapped afterwards; --db adds bookings whose outcome is final;
+2. the stratified train/test split is taken on row indices (so it is
+   identical to the notebook's) and each side is gathered straight into a
+   float32 matrix, the dtype the forest trains on.
+
+With --engine hgb the model file holds a HistGradientBoostingClassifier
+instead (trained on float64, the dtype it predicts on); the app loads and
+scores either kind. compare_engines.py compares the two.
+
+Wall time and peak RSS are logged after every stage.
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.metrics import classification_report, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from dataset_cache import CACHE_DIR, load_dataset
+from model_bundle import DEFAULT_FEATURE_COLS, ENCODERS_FILENAME, FEATURE_COLS_FILENAME, MODEL_FILENAME
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+
+class StageLog:
+    """Prints wall time and peak RSS after each training stage."""
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+
+    def __call__(self, stage):
+        now = time.perf_counter()
+        print(f"[{now - self.start:8.2f}s] {stage:<28} {now - self.last:8.2f}s  peak RSS {peak_rss_mb():,.0f} MB",
+              flush=True)
+        self.last = now
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1e6
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1024
+
+
+def make_model(args):
+    """Unfitted model for --engine, and the dtype it trains on."""
+    if args.engine == "hgb":
+        return HistGradientBoostingClassifier(
+            max_iter=args.max_iter,
+            learning_rate=args.learning_rate,
+            max_leaf_nodes=args.max_leaf_nodes,
+            max_depth=args.max_depth,
+            min_samples_leaf=20 if args.min_samples_leaf is None else args.min_samples_leaf,
+            random_state=args.random_state,
+        ), np.float64
+    return RandomForestClassifier(
+        n_estimators=args.n_estimators,
+        max_depth=15 if args.max_depth is None else args.max_depth,
+        min_samples_leaf=1 if args.min_samples_leaf is None else args.min_samples_leaf,
+        max_features=args.max_features,
+        random_state=args.random_state,
+        n_jobs=args.n_jobs,
+    ), np.float32
+
+
+def max_features(value):
+    return value if value in ("sqrt", "log2") else float(value)
+
+
+def save_artifacts(output_dir, rf_model, encoders, feature_cols):
+    os.makedirs(output_dir, exist_ok=True)
+    for name, obj in ((MODEL_FILENAME, rf_model), (ENCODERS_FILENAME, encoders), (FEATURE_COLS_FILENAME, feature_cols)):
+        tmp_path = os.path.join(output_dir, f".{name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(obj, f)
+        os.replace(tmp_path, os.path.join(output_dir, name))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=os.path.join(BASE_DIR, "hotel.csv"), help="training data in hotel.csv format")
+    parser.add_argument("-o", "--output", default=os.path.join(BASE_DIR, "model_files"), help="artifact directory")
+    parser.add_argument("--db", help="also train on final-outcome bookings from this database")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="dataset cache root (default: dataset_cache/)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="CSV rows per chunk (default: 100000)")
+    parser.add_argument("--engine", choices=("forest", "hgb"), default="forest",
+                        help="RandomForestClassifier or HistGradientBoostingClassifier (default: forest)")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, help="default: 15 for forest, unlimited for hgb")
+    parser.add_argument("--min-samples-leaf", type=int, help="default: 1 for forest, 20 for hgb")
+    parser.add_argument("--max-features", type=max_features, default="sqrt", help='"sqrt", "log2" or a fraction')
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--max-iter", type=int, default=200, help="boosting iterations (hgb)")
+    parser.add_argument("--learning-rate", type=float, default=0.1, help="hgb")
+    parser.add_argument("--max-leaf-nodes", type=int, default=31, help="hgb")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--random-state", type=int, default=42)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    log = StageLog()
+    feature_cols = list(DEFAULT_FEATURE_COLS)
+    dataset = load_dataset(args.csv, args.db, args.cache_dir, args.chunk_size)
+    y = np.asarray(dataset.label)
+    log(f"dataset ({dataset.n_rows:,} rows)")
+
+    train_idx, test_idx = train_test_split(
+        np.arange(len(y)), test_size=args.test_size, random_state=args.random_state, stratify=y
+    )
+    rf_model, dtype = make_model(args)
+    X_train = dataset.matrix(feature_cols, train_idx, dtype=dtype)
+    X_test = dataset.matrix(feature_cols, test_idx, dtype=dtype)
+    y_train, y_test = y[train_idx], y[test_idx]
+    encoders = dataset.encoders()
+    log(f"split + feature matrix ({(X_train.nbytes + X_test.nbytes) / 1e6:,.0f} MB)")
+
+    # A DataFrame view (no copy) so the model records feature names, as in the notebook
+    rf_model.fit(pd.DataFrame(X_train, columns=feature_cols, copy=False), y_train)
+    log("fit")
+
+    X_test = pd.DataFrame(X_test, columns=feature_cols, copy=False)
+    rf_pred_proba = rf_model.predict_proba(X_test)[:, 1]
+    print(f"ROC-AUC Score: {roc_auc_score(y_test, rf_pred_proba):.4f}")
+    print(classification_report(y_test, rf_model.classes_[(rf_pred_proba > 0.5).astype(int)],
+                                target_names=["Not Canceled", "Canceled"]))
+    log("evaluate")
+
+    save_artifacts(args.output, rf_model, encoders, feature_cols)
+    log(f"saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# tune.py - parallel hyperparameter search for the cancellation forest
+"""
+Usage:
+    python tune.py [--search grid | --search random --trials 30] [--folds 5]
+                   [--workers N] [--out tuning] [--db hotel_booking.db]
+
+Cross-validates RandomForestClassifier candidates on the training part of
+train.ipynb's split (the 20% test split stays untouched) and prints a
+leaderboard ranked by mean ROC-AUC, with fit time and predict latency.
+
+The feature matrix and the stratified fold indices are computed once and
+written to OUT/ (matrix.npy, folds.npz); worker processes memory-map them
+instead of re-reading and re-encoding the data per candidate. Each candidate
+is fitted single-threaded and the candidates run in parallel across a
+process pool.
+
+Every finished candidate is appended to OUT/trials.jsonl as soon as it
+completes. Re-running the same command skips candidates already recorded
+for the same data and folds, so an interrupted search picks up where it
+stopped. Train the winner with train.py --n-estimators/--max-depth/
+--min-samples-leaf/--max-features.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold, train_test_split
+
+from dataset_cache import CACHE_DIR, load_dataset
+from forest_engine import FlatForest
+from model_bundle import DEFAULT_FEATURE_COLS
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# train.ipynb uses n_estimators=100, max_depth=15 and sklearn's defaults otherwise
+PARAM_SPACE = {
+    "n_estimators": [100, 200, 400],
+    "max_depth": [10, 15, 20, None],
+    "min_samples_leaf": [1, 2, 4],
+    "max_features": ["sqrt", 0.5],
+}
+
+# Rows timed one at a time through FlatForest (the app's scoring path)
+LATENCY_ROWS = 200
+
+# Set in each worker by init_worker()
+_worker = {}
+
+
+def candidate_id(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def candidates(search, trials, seed):
+    if search == "grid":
+        return list(ParameterGrid(PARAM_SPACE))
+    return list(ParameterSampler(PARAM_SPACE, n_iter=trials, random_state=seed))
+
+
+def prepare(dataset, feature_cols, out_dir, n_folds, seed):
+    """Write the training matrix, labels and fold indices once; returns the data id."""
+    y = np.asarray(dataset.label)
+    train_idx, _ = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42, stratify=y)
+    data_id = f"{dataset.key}:folds={n_folds}:seed={seed}"
+    meta_path = os.path.join(out_dir, "data.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f).get("data_id") == data_id:
+                return data_id
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "matrix.npy"), dataset.matrix(feature_cols, train_idx))
+    np.save(os.path.join(out_dir, "labels.npy"), y[train_idx])
+    folds = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed).split(train_idx, y[train_idx])
+    np.savez(os.path.join(out_dir, "folds.npz"),
+             **{f"valid_{i}": valid for i, (_, valid) in enumerate(folds)})
+    with open(meta_path, "w") as f:
+        json.dump({"data_id": data_id, "rows": len(train_idx), "features": feature_cols}, f, indent=2)
+    return data_id
+
+
+def init_worker(out_dir):
+    _worker["X"] = np.load(os.path.join(out_dir, "matrix.npy"), mmap_mode="r")
+    _worker["y"] = np.load(os.path.join(out_dir, "labels.npy"))
+    with np.load(os.path.join(out_dir, "folds.npz")) as folds:
+        _worker["folds"] = [folds[f"valid_{i}"] for i in range(len(folds.files))]
+
+
+def evaluate(params, random_state):
+    """Cross-validated ROC-AUC, fit time and predict latency of one candidate."""
+    X, y = _worker["X"], _worker["y"]
+    aucs, fit_seconds, predict_us = [], [], []
+    for valid in _worker["folds"]:
+        train = np.ones(len(y), dtype=bool)
+        train[valid] = False
+        model = RandomForestClassifier(**params, random_state=random_state, n_jobs=1)
+        start = time.perf_counter()
+        model.fit(X[train], y[train])
+        fit_seconds.append(time.perf_counter() - start)
+
+        X_valid = X[valid]
+        start = time.perf_counter()
+        probabilities = model.predict_proba(X_valid)[:, 1]
+        predict_us.append((time.perf_counter() - start) / len(valid) * 1e6)
+        aucs.append(roc_auc_score(y[valid], probabilities))
+
+    # Single-row latency through the engine the app serves, on the last fold's model
+    forest = FlatForest.from_sklearn(model)
+    rows = np.asarray(X_valid[:LATENCY_ROWS], dtype=np.float64)
+    timings = []
+    for row in rows:
+        start = time.perf_counter()
+        forest.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "roc_auc": float(np.mean(aucs)),
+        "roc_auc_std": float(np.std(aucs)),
+        "fold_auc": [float(a) for a in aucs],
+        "fit_seconds": float(np.mean(fit_seconds)),
+        "batch_predict_us_per_row": float(np.mean(predict_us)),
+        "single_row_p50_ms": float(np.percentile(timings, 50) * 1000.0),
+        "nodes": int(forest.n_nodes),
+    }
+
+
+def read_trials(path, data_id):
+    """Finished trials for `data_id`, keyed by candidate id."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                trial = json.loads(line)
+            except json.JSONDecodeError:  # torn last line from an interrupted run
+                continue
+            if trial.get("data_id") == data_id:
+                done[candidate_id(trial["params"])] = trial
+    return done
+
+
+def print_leaderboard(trials, top):
+    ranked = sorted(trials, key=lambda t: t["roc_auc"], reverse=True)
+    print(f"\n{'#':>3}  {'ROC-AUC':>8} {'± std':>7} {'fit s':>7} {'µs/row':>7} {'p50 ms':>7} {'nodes':>9}  params")
+    for rank, t in enumerate(ranked[:top], 1):
+        print(f"{rank:>3}  {t['roc_auc']:>8.4f} {t['roc_auc_std']:>7.4f} {t['fit_seconds']:>7.2f}"
+              f" {t['batch_predict_us_per_row']:>7.2f} {t['single_row_p50_ms']:>7.3f} {t['nodes']:>9,}"
+              f"  {candidate_id(t['params'])}")
+    return ranked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=os.path.join(BASE_DIR, "hotel.csv"), help="training data in hotel.csv format")
+    parser.add_argument("--db", help="also use final-outcome bookings from this database")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="dataset cache root (default: dataset_cache/)")
+    parser.add_argument("--out", default=os.path.join(BASE_DIR, "tuning"), help="work directory (default: tuning/)")
+    parser.add_argument("--search", choices=("grid", "random"), default="grid")
+    parser.add_argument("--trials", type=int, default=20, help="candidates drawn by --search random")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parallel processes (default: all CPUs)")
+    parser.add_argument("--seed", type=int, default=42, help="seed for the folds, the sampler and the forests")
+    parser.add_argument("--top", type=int, default=10, help="leaderboard rows to print")
+    args = parser.parse_args()
+
+    dataset = load_dataset(args.csv, args.db, args.cache_dir)
+    data_id = prepare(dataset, list(DEFAULT_FEATURE_COLS), args.out, args.folds, args.seed)
+    trials_path = os.path.join(args.out, "trials.jsonl")
+    done = read_trials(trials_path, data_id)
+    todo = [p for p in candidates(args.search, args.trials, args.seed) if candidate_id(p) not in done]
+    print(f"{len(done)} candidates already evaluated, {len(todo)} to go on {args.workers} workers")
+
+    finished = list(done.values())
+    if todo:
+        pool = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(args.out,))
+        try:
+            futures = {pool.submit(evaluate, params, args.seed): params for params in todo}
+            with open(trials_path, "a") as f:
+                for future in as_completed(futures):
+                    trial = dict(future.result(), params=futures[future], data_id=data_id)
+                    f.write(json.dumps(trial) + "\n")
+                    f.flush()
+                    finished.append(trial)
+                    print(f"[{len(finished) - len(done)}/{len(todo)}] ROC-AUC {trial['roc_auc']:.4f}"
+                          f"  fit {trial['fit_seconds']:.2f}s  {candidate_id(trial['params'])}", flush=True)
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            sys.exit(f"Interrupted; {len(finished) - len(done)} new results saved to {trials_path}")
+        pool.shutdown()
+
+    ranked = print_leaderboard(finished, args.top)
+    with open(os.path.join(args.out, "leaderboard.json"), "w") as f:
+        json.dump(ranked, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()